@@ -0,0 +1,26 @@
+import pytest
+
+from core.testing import temp_caches
+
+
+@pytest.fixture(autouse=True)
+def inline_workers(settings):
+    """Миниатюры и ленты заполняются сразу, без пулов потоков.
+
+    Тесты с transaction=True фиксируют транзакции, и фоновый поток
+    писал бы в MEDIA_ROOT и базу, которые тест к тому времени уже
+    удалил.
+    """
+    settings.THUMBNAIL_WORKERS = 0
+    settings.FEED_WORKERS = 0
+
+
+@pytest.fixture(scope='session')
+def cache_directory(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('cache'))
+
+
+@pytest.fixture(autouse=True)
+def temp_cache(settings, cache_directory):
+    """Кеш во временном каталоге, а не общий BASE_DIR/cache."""
+    settings.CACHES = temp_caches(cache_directory)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from PIL import Image
+
+        # Pillow откажется открывать картинки вдвое больше бюджета
+        # и в формах, и в пуле миниатюр.
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
@@ -0,0 +1,127 @@
+import base64
+import math
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+
+def draft_size(size, side):
+    """Размер, до которого картинку size уменьшит downsize."""
+    scale = side / max(size)
+    return tuple(math.ceil(length * scale) for length in size)
+
+
+def downsize(file_, image_format):
+    """Уменьшает картинку до IMAGE_MAX_SIDE по большей стороне.
+
+    JPEG декодируется в масштабе 1/2, 1/4 или 1/8 — наименьшем,
+    который не меньше итогового размера, поэтому растр в памяти
+    меньше (2 × IMAGE_MAX_SIDE)² пикселей. Остальные форматы Pillow
+    декодирует только целиком; их размер ограничивает
+    IMAGE_MAX_FULL_DECODE_PIXELS (см. check_header). Поворот
+    по EXIF делается уже после уменьшения.
+    """
+    side = settings.IMAGE_MAX_SIDE
+    file_.seek(0)
+    with Image.open(file_) as image:
+        image.draft(image.mode, draft_size(image.size, side))
+        image.thumbnail((side, side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, image_format, **SAVE_OPTIONS.get(image_format, {}))
+    return SimpleUploadedFile(
+        file_.name, buffer.getvalue(), Image.MIME.get(image_format))
+
+
+ERRORS = {
+    'too_large': 'Файл больше %(limit)s.',
+    'unsupported_format': 'Поддерживаются только %(formats)s.',
+    'too_many_pixels': ('Картинка %(width)s×%(height)s слишком большая: '
+                        'допустимо до %(limit)s пикселей.'),
+}
+
+
+def check_header(f):
+    """Проверяет размер файла, формат и число пикселей по заголовку.
+
+    Растр не декодируется. Для форматов, кроме JPEG, предел пикселей
+    ниже: их нельзя декодировать в уменьшенном масштабе.
+    Возвращает формат картинки.
+    """
+    if f.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            ERRORS['too_large'], code='too_large',
+            params={'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)})
+    f.seek(0)
+    with warnings.catch_warnings():
+        # Предупреждение Pillow о «бомбе» заменяет проверка ниже.
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        with Image.open(f) as image:
+            image_format = image.format
+            width, height = image.size
+    if image_format not in settings.IMAGE_FORMATS:
+        raise ValidationError(
+            ERRORS['unsupported_format'], code='unsupported_format',
+            params={'formats': ', '.join(settings.IMAGE_FORMATS)})
+    limit = settings.IMAGE_MAX_PIXELS
+    if image_format != 'JPEG':
+        limit = min(limit, settings.IMAGE_MAX_FULL_DECODE_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            ERRORS['too_many_pixels'], code='too_many_pixels',
+            params={'width': width, 'height': height, 'limit': limit})
+    return image_format, (width, height)
+
+
+def ingest_image(f):
+    """Принимает загруженную картинку: проверяет и при нужде уменьшает.
+
+    Вызывается после forms.ImageField, который лишь читает заголовок
+    и проверяет структуру файла. Картинки со стороной больше
+    IMAGE_MAX_SIDE уменьшаются, поэтому оригиналы в хранилище
+    не бывают больше этого размера.
+    """
+    image_format, size = check_header(f)
+    if max(size) > settings.IMAGE_MAX_SIDE:
+        f = downsize(f, image_format)
+    f.seek(0)
+    return f
+
+
+# Теги EXIF Orientation, при которых картинка повёрнута на 90°.
+ROTATED = (5, 6, 7, 8)
+
+
+def preview(f, size):
+    """Размеры картинки и её крошечная копия (LQIP) как data: URI.
+
+    Копия обрезается по центру до size, как варианты в srcset,
+    и весит сотни байт, поэтому выводится прямо в HTML. Размеры
+    учитывают поворот по EXIF, как его показывает браузер.
+    """
+    f.seek(0)
+    with Image.open(f) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in ROTATED:
+            width, height = height, width
+        image.draft('RGB', (size[0] * 4, size[1] * 4))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', optimize=True)
+    f.seek(0)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return (width, height), f'data:image/png;base64,{data}'
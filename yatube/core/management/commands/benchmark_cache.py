@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+VALUE = 'x' * 1024
+
+
+def make_backend(name, location):
+    if name == 'locmem':
+        return LocMemCache('benchmark', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+    return SQLiteCache(location, {'OPTIONS': {'MAX_ENTRIES': 100000}})
+
+
+def run_worker(args):
+    """Читает ключи с распределением Ципфа, промах дозаписывает в кеш.
+
+    Небольшая доля операций удаляет ключ — так выглядят сбросы
+    при изменении данных.
+    """
+    backend, location, seed, operations, keys, invalidate = args
+    cache = make_backend(backend, location)
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    names = [f'key{rank}' for rank in range(keys)]
+    hits = reads = 0
+    latencies = []
+    for name in rng.choices(names, weights, k=operations):
+        started = time.perf_counter()
+        if rng.random() < invalidate:
+            cache.delete(name)
+        else:
+            reads += 1
+            if cache.get(name) is None:
+                cache.set(name, VALUE)
+            else:
+                hits += 1
+        latencies.append(time.perf_counter() - started)
+    return hits, reads, latencies
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает долю попаданий и задержку кешей '
+            'при разном числе процессов-воркеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default='1,2,4,8,16',
+            help='Числа процессов через запятую.')
+        parser.add_argument(
+            '--operations', type=int, default=5000,
+            help='Операций на один процесс.')
+        parser.add_argument(
+            '--keys', type=int, default=2000,
+            help='Размер множества ключей.')
+        parser.add_argument(
+            '--invalidate', type=float, default=0.01,
+            help='Доля операций, удаляющих ключ.')
+        parser.add_argument(
+            '--backend', choices=('locmem', 'sqlite', 'all'), default='all')
+
+    def handle(self, *args, **options):
+        backends = ('locmem', 'sqlite')
+        if options['backend'] != 'all':
+            backends = (options['backend'],)
+        workers = [int(number) for number in options['workers'].split(',')]
+        directory = tempfile.mkdtemp()
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"backend":<8}{"workers":>8}{"hit rate":>10}'
+            f'{"p50, мкс":>10}{"p95, мкс":>10}{"ops/s":>10}')
+        try:
+            for backend in backends:
+                for count in workers:
+                    location = os.path.join(directory, f'{backend}{count}')
+                    jobs = [
+                        (backend, location, seed, options['operations'],
+                         options['keys'], options['invalidate'])
+                        for seed in range(count)]
+                    started = time.perf_counter()
+                    with context.Pool(count) as pool:
+                        results = pool.map(run_worker, jobs)
+                    elapsed = time.perf_counter() - started
+                    self.report(backend, count, results, elapsed)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def report(self, backend, count, results, elapsed):
+        hits = sum(result[0] for result in results)
+        reads = sum(result[1] for result in results)
+        latencies = sorted(
+            latency for result in results for latency in result[2])
+        p50 = statistics.median(latencies) * 1e6
+        p95 = latencies[int(len(latencies) * 0.95)] * 1e6
+        self.stdout.write(
+            f'{backend:<8}{count:>8}{hits / max(reads, 1):>10.1%}'
+            f'{p50:>10.1f}{p95:>10.1f}{len(latencies) / elapsed:>10.0f}')
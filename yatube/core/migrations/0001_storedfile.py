@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+    ]
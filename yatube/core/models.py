@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл хранилища core.storage и число ссылок на него."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        primary_key=True)
+    references = models.PositiveIntegerField(
+        verbose_name='Ссылок',
+        default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def hole_marker(template_name, hole_context):
+    """Метка на месте персонального фрагмента в общей копии страницы."""
+    payload = json.dumps({'template': template_name, 'context': hole_context})
+    token = base64.urlsafe_b64encode(payload.encode()).decode()
+    return mark_safe(f'<!--hole:{token}-->')
+
+
+def fill_holes(content, request, extra_context):
+    """Подставляет в страницу фрагменты, отрисованные для request."""
+    def render_hole(match):
+        payload = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        context = dict(extra_context, **payload['context'])
+        return render_to_string(payload['template'], context, request=request)
+    return HOLE_RE.sub(render_hole, content)
+
+
+def page_params(request):
+    return '&'.join(
+        f'{name}={request.GET.get(name, "")}' for name in ('page', 'cursor'))
+
+
+def page_key(request, version):
+    return f'page:{version}:{request.path}?{page_params(request)}'
+
+
+def get_version(request, version, *args, **kwargs):
+    """version(request, ...), вычисленная не больше раза на запрос."""
+    versions = request.__dict__.setdefault('_page_versions', {})
+    if version not in versions:
+        versions[version] = version(request, *args, **kwargs)
+    return versions[version]
+
+
+def page_etag(version, personal_version=None):
+    """etag_func для django.views.decorators.http.condition.
+
+    Валидатор собирается из поколения данных страницы, номера страницы
+    и состояния посетителя, поэтому проверяется без рендеринга шаблона
+    и основного запроса к базе.
+    """
+    def etag_func(request, *args, **kwargs):
+        value = get_version(request, version, *args, **kwargs)
+        if value is None:
+            return None
+        parts = [request.path, value, page_params(request)]
+        if request.user.is_authenticated:
+            parts += [str(request.user.pk),
+                      request.META.get('CSRF_COOKIE', '')]
+            if personal_version is not None:
+                parts.append(personal_version(request) or '')
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag_func
+
+
+def cache_page_with_holes(version, personalize=None):
+    """Кеширует страницу целиком, общей копией для всех посетителей.
+
+    Персональные фрагменты шаблон отмечает тегом {% hole %}; они
+    рисуются заново для каждого запроса поверх копии из кеша.
+    version(request, ...) получает аргументы view и входит в ключ, его
+    смена сбрасывает копии страниц; None отключает кеш для запроса.
+    personalize(request, *args, **kwargs) возвращает данные, которые
+    нужны фрагментам, но не хранятся в общей копии.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not settings.PAGE_CACHE_TIMEOUT:
+                return view(request, *args, **kwargs)
+            page_version = get_version(request, version, *args, **kwargs)
+            if page_version is None:
+                return view(request, *args, **kwargs)
+            key = page_key(request, page_version)
+            content = cache.get(key)
+            response = None
+            if content is None:
+                request.punch_holes = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.punch_holes = False
+                content = response.content.decode(response.charset)
+                if response.status_code == 200:
+                    cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+            extra_context = {}
+            if personalize is not None:
+                extra_context = personalize(request, *args, **kwargs)
+            content = fill_holes(content, request, extra_context)
+            if response is None:
+                response = HttpResponse()
+            response.content = content
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,298 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SQLITE_INT_MIN = -2 ** 63
+SQLITE_INT_MAX = 2 ** 63 - 1
+# Старые сборки SQLite принимают не больше 999 параметров в запросе.
+MAX_QUERY_KEYS = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite (режим WAL), общий для всех процессов узла.
+
+    В отличие от LocMemCache все воркеры видят одни и те же записи
+    и сбросы. incr выполняется в транзакции BEGIN IMMEDIATE, поэтому
+    атомарен между процессами. Просроченные записи удаляются при
+    чтении и при чистке; при превышении MAX_ENTRIES или MAX_SIZE
+    (байт) удаляются давно не читавшиеся записи.
+
+    OPTIONS: MAX_ENTRIES, MAX_SIZE, CULL_FREQUENCY — доля записей
+    (1/CULL_FREQUENCY), освобождаемая при чистке, CULL_EVERY — через
+    сколько записей процесс проверяет лимиты, BUSY_TIMEOUT — сколько
+    секунд ждать блокировки файла.
+    """
+    # Время последнего чтения обновляется не чаще раза в секунду.
+    ACCESS_RESOLUTION = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        self._cull_every = int(options.get('CULL_EVERY', 16))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    @staticmethod
+    def _encode(value):
+        if (type(value) is int
+                and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    @staticmethod
+    def _size(key, stored):
+        size = len(stored) if isinstance(stored, bytes) else 8
+        return len(key) + size
+
+    @staticmethod
+    def _expired(expires, now):
+        return expires is not None and expires <= now
+
+    def _store(self, db, key, value, timeout, mode='REPLACE'):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        if expires is not None and expires <= now:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return False
+        stored = self._encode(value)
+        cursor = db.execute(
+            f'INSERT OR {mode} INTO cache '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            (key, stored, expires, now, self._size(key, stored)))
+        return cursor.rowcount > 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()))
+            added = self._store(db, key, value, timeout, mode='IGNORE')
+        if added:
+            self._maybe_cull()
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        row = db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        now = time.time()
+        if self._expired(expires, now):
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            return default
+        if now - accessed > self.ACCESS_RESOLUTION:
+            db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as db:
+            self._store(db, key, value, timeout)
+        self._maybe_cull()
+
+    def get_many(self, keys, version=None):
+        """Читает ключи одним запросом на каждые MAX_QUERY_KEYS ключей."""
+        keys_map = {}
+        for key in keys:
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            keys_map[made] = key
+        made_keys = list(keys_map)
+        db = self._db
+        now = time.time()
+        found, expired, stale = {}, [], []
+        for start in range(0, len(made_keys), MAX_QUERY_KEYS):
+            chunk = made_keys[start:start + MAX_QUERY_KEYS]
+            rows = db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN (%s)' % ', '.join('?' * len(chunk)), chunk)
+            for key, value, expires, accessed in rows:
+                if self._expired(expires, now):
+                    expired.append(key)
+                    continue
+                if now - accessed > self.ACCESS_RESOLUTION:
+                    stale.append(key)
+                found[keys_map[key]] = self._decode(value)
+        if expired or stale:
+            with self._transaction() as db:
+                db.executemany(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    ((key, now) for key in expired))
+                db.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    ((now, key) for key in stale))
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает все значения в одной транзакции."""
+        items = []
+        for key, value in data.items():
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            items.append((made, value))
+        with self._transaction() as db:
+            for key, value in items:
+                self._store(db, key, value, timeout)
+        self._maybe_cull()
+        return []
+
+    def delete_many(self, keys, version=None):
+        made_keys = []
+        for key in keys:
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            made_keys.append(made)
+        with self._transaction() as db:
+            for start in range(0, len(made_keys), MAX_QUERY_KEYS):
+                chunk = made_keys[start:start + MAX_QUERY_KEYS]
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (%s)'
+                    % ', '.join('?' * len(chunk)), chunk)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or self._expired(row[1], time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._decode(row[0]) + delta
+            stored = self._encode(new_value)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (stored, self._size(key, stored), key))
+        return new_value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._db.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока: открытие файла
+        # и проверка схемы на каждый запрос стоили бы дороже.
+        pass
+
+    def _maybe_cull(self):
+        self._writes += 1
+        if self._writes % self._cull_every == 0:
+            self.cull()
+
+    def cull(self):
+        """Удаляет просроченные записи и вытесняет лишние по LRU."""
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count, size = db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+            ).fetchone()
+            if count > self._max_entries:
+                evict = count - self._max_entries
+                evict += self._max_entries // self._cull_frequency
+                self._evict_oldest(db, evict)
+            if self._max_size and size > self._max_size:
+                target = size - self._max_size
+                target += self._max_size // self._cull_frequency
+                (evict,) = db.execute(
+                    'SELECT COUNT(*) FROM ('
+                    ' SELECT size, SUM(size) OVER ('
+                    '  ORDER BY accessed ROWS UNBOUNDED PRECEDING) AS freed'
+                    ' FROM cache) WHERE freed - size < ?',
+                    (target,)).fetchone()
+                self._evict_oldest(db, evict)
+
+    @staticmethod
+    def _evict_oldest(db, count):
+        db.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (count,))
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — хеш его содержимого.
+
+    Загрузка пишется во временный файл и одновременно хешируется,
+    затем переносится в <каталог>/<ab>/<sha256><расширение>. Одинаковое
+    содержимое хранится один раз; число ссылок на файл ведёт StoredFile,
+    а release() удаляет файл, когда ссылок не осталось.
+    """
+    def get_available_name(self, name, max_length=None):
+        # Имя определит содержимое; одинаковые имена — одинаковые файлы.
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(
+            dir=full_directory, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension)
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(temp_path)
+                # Свежее время изменения защищает файл от gc_media,
+                # пока новый пост с ним ещё не сохранён.
+                os.utime(path)
+            else:
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.retain(name)
+        return name
+
+    def retain(self, name):
+        """Добавляет ссылку на файл name."""
+        with transaction.atomic():
+            updated = StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1)
+            if not updated:
+                stored, created = StoredFile.objects.get_or_create(
+                    name=name, defaults={'references': 1})
+                if not created:
+                    StoredFile.objects.filter(name=name).update(
+                        references=F('references') + 1)
+
+    def release(self, name):
+        """Убирает ссылку на файл name; последняя удаляет сам файл.
+
+        Возвращает True, если файл удалён. Файлы, которых нет
+        в StoredFile (загруженные до этого хранилища), не трогает.
+        """
+        with transaction.atomic():
+            updated = StoredFile.objects.filter(
+                name=name, references__gt=0).update(
+                    references=F('references') - 1)
+            if not updated:
+                return False
+            deleted, _ = StoredFile.objects.filter(
+                name=name, references=0).delete()
+        if deleted:
+            self.delete(name)
+        return bool(deleted)
@@ -0,0 +1,22 @@
+from django import template
+from django.template.loader import render_to_string
+
+from core.page_cache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **hole_context):
+    """Персональный фрагмент страницы.
+
+    При кешировании страницы целиком вместо фрагмента выводится метка,
+    которую cache_page_with_holes заменяет для каждого посетителя.
+    hole_context должен состоять из строк и чисел.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return hole_marker(template_name, hole_context)
+    flat_context = context.flatten()
+    flat_context.update(hole_context)
+    return render_to_string(template_name, flat_context, request=request)
@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+PAGE_PARAMS = ('page', 'cursor')
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Строка запроса для другой страницы списка.
+
+    Параметры пагинации заменяются на params, остальные
+    (например, ?q= поиска) сохраняются.
+    """
+    query = context['request'].GET.copy()
+    for key in PAGE_PARAMS:
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return '?' + query.urlencode()
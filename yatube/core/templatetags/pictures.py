@@ -0,0 +1,69 @@
+from django import template
+from django.conf import settings
+from sorl.thumbnail import default
+
+from core.thumbnails import (
+    MIME_TYPES, PlaceholderImage, post_image_thumbnails, post_image_variants,
+    prefetch)
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Заранее находит миниатюры картинок всех постов страницы.
+
+    Ставится перед циклом по постам; теги {% picture %} в цикле
+    берут ответ из памяти, не обращаясь к кешу и БД.
+    """
+    prefetch([post.image for post in posts], post_image_thumbnails())
+    return ''
+
+
+@register.inclusion_tag('includes/picture.html')
+def picture(image, css_class='', placeholder=''):
+    """Картинка поста: <picture> с srcset по ширинам и форматам.
+
+    Браузер выбирает первый понятный ему формат и ширину под экран;
+    JPEG наибольшей ширины остаётся в src для старых браузеров.
+    placeholder — размытая копия картинки (data: URI), которая
+    видна до загрузки; пока варианты не готовы, выводится она
+    или общая заглушка. Размеры задаются всегда, поэтому вёрстка
+    не сдвигается, когда картинка догружается.
+    """
+    if not image:
+        return {'image': None}
+    width, height = settings.POST_IMAGE_SIZE
+    sources = {}
+    ready = True
+    for image_format, variant_width, geometry_string, options in (
+            post_image_variants()):
+        thumbnail = default.backend.get_thumbnail(
+            image, geometry_string, **options)
+        ready = ready and not isinstance(thumbnail, PlaceholderImage)
+        sources.setdefault(image_format, []).append(
+            (variant_width, thumbnail))
+    if not ready:
+        return {'image': PlaceholderImage(f'{width}x{height}'),
+                'css_class': css_class,
+                'placeholder': placeholder,
+                'width': width,
+                'height': height}
+    fallback = sources.pop('JPEG')
+    return {
+        'image': fallback[-1][1],
+        'css_class': css_class,
+        'placeholder': placeholder,
+        'width': width,
+        'height': height,
+        'sizes': f'(max-width: {width}px) 100vw, {width}px',
+        'srcset': _srcset(fallback),
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': _srcset(variants)}
+            for image_format, variants in sources.items()],
+    }
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{thumbnail.url} {width}w' for width, thumbnail in variants)
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def temp_caches(directory):
+    """CACHES, в которых файлы SQLiteCache лежат в каталоге directory."""
+    caches = {}
+    for alias, options in settings.CACHES.items():
+        options = dict(options)
+        if options['BACKEND'] == 'core.sqlite_cache.SQLiteCache':
+            options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+        caches[alias] = options
+    return caches
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с кешем во временном каталоге.
+
+    Иначе тесты читали бы и сбрасывали общий кеш BASE_DIR/cache,
+    которым пользуется запущенный на этом узле сайт.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp()
+        self.cache_settings = override_settings(
+            CACHES=temp_caches(self.cache_directory))
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,106 @@
+import base64
+from io import BytesIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from core.images import downsize, ingest_image, preview
+from posts.forms import PostForm
+
+
+def make_image(size, image_format='JPEG', name='image.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(IMAGE_MAX_SIDE=100, IMAGE_MAX_PIXELS=40000,
+                   IMAGE_MAX_FULL_DECODE_PIXELS=20000,
+                   IMAGE_MAX_UPLOAD_SIZE=100000)
+class IngestImageTest(SimpleTestCase):
+    def test_small_image_is_kept(self):
+        """Картинка в пределах бюджета сохраняется как есть."""
+        upload = make_image((80, 60))
+        self.assertIs(ingest_image(upload), upload)
+
+    def test_large_image_is_downsized(self):
+        """Сторона больше IMAGE_MAX_SIDE уменьшается с сохранением формата."""
+        ingested = ingest_image(make_image((180, 90)))
+        with Image.open(ingested) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(ingested.name, 'image.jpg')
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS отклоняется по заголовку."""
+        with self.assertRaises(ValidationError) as error:
+            ingest_image(make_image((300, 300)))
+        self.assertEqual(error.exception.code, 'too_many_pixels')
+
+    def test_full_decode_formats_have_lower_limit(self):
+        """PNG декодируется целиком, и предел пикселей для него ниже."""
+        self.assertTrue(ingest_image(make_image((150, 150))))
+        with self.assertRaises(ValidationError) as error:
+            ingest_image(make_image((150, 150), 'PNG', 'image.png'))
+        self.assertEqual(error.exception.code, 'too_many_pixels')
+
+    def test_jpeg_decoded_at_reduced_scale(self):
+        """Длинный JPEG декодируется в наименьшем подходящем масштабе."""
+        thumbnail = Image.Image.thumbnail
+        decoded = []
+
+        def spy(image, *args, **kwargs):
+            decoded.append(image.size)
+            return thumbnail(image, *args, **kwargs)
+
+        with mock.patch.object(Image.Image, 'thumbnail', spy):
+            downsized = downsize(make_image((1200, 200)), 'JPEG')
+        self.assertEqual(decoded, [(150, 25)])
+        with Image.open(downsized) as image:
+            self.assertEqual(max(image.size), 100)
+
+    def test_unsupported_format_rejected(self):
+        """Форматы не из IMAGE_FORMATS отклоняются."""
+        with self.assertRaises(ValidationError) as error:
+            ingest_image(make_image((10, 10), 'BMP', 'image.bmp'))
+        self.assertEqual(error.exception.code, 'unsupported_format')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_file_rejected(self):
+        """Файл больше IMAGE_MAX_UPLOAD_SIZE отклоняется."""
+        with self.assertRaises(ValidationError) as error:
+            ingest_image(make_image((80, 60)))
+        self.assertEqual(error.exception.code, 'too_large')
+
+    def test_post_form_uses_ingest(self):
+        """PostForm пропускает загрузку через ingest_image."""
+        form = PostForm(data={'text': 'Текст'},
+                        files={'image': make_image((300, 300))})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+
+class PreviewTest(SimpleTestCase):
+    def test_preview_is_tiny_crop(self):
+        """Заглушка — PNG заданного размера, размеры — исходные."""
+        size, placeholder = preview(make_image((300, 120)), (16, 6))
+        self.assertEqual(size, (300, 120))
+        prefix = 'data:image/png;base64,'
+        self.assertTrue(placeholder.startswith(prefix))
+        self.assertLess(len(placeholder), 1024)
+        data = base64.b64decode(placeholder[len(prefix):])
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, (16, 6))
+
+    def test_exif_rotation_swaps_size(self):
+        """Для повёрнутой по EXIF картинки ширина и высота меняются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (300, 120)).save(buffer, 'JPEG', exif=exif.tobytes())
+        size, _ = preview(SimpleUploadedFile('image.jpg', buffer.getvalue()),
+                          (16, 6))
+        self.assertEqual(size, (120, 300))
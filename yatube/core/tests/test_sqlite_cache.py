@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.sqlite_cache import SQLiteCache
+
+
+def incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('key', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_does_not_overwrite(self):
+        """add не перезаписывает существующий ключ."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_entries_expire(self):
+        """Просроченные записи не отдаются."""
+        self.cache.set('key', 'value', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра видна другому."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+        self.make_cache().clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_missing_key(self):
+        """incr отсутствующего ключа вызывает ValueError."""
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет приращений."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=incr_many, args=(self.location, 50))
+            for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction_by_entries(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_EVERY=1)
+        cache.ACCESS_RESOLUTION = 0
+        for name in ('a', 'b', 'c'):
+            cache.set(name, name)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertEqual(cache.get('d'), 'd')
+        self.assertIsNone(cache.get('b'))
+
+    def test_eviction_by_size(self):
+        """Суммарный размер записей не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=10000, CULL_EVERY=1)
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 2000)
+        self.assertIsNotNone(cache.get('key9'))
+        self.assertIsNone(cache.get('key0'))
+
+    def trace(self, cache):
+        statements = []
+        cache._db.set_trace_callback(statements.append)
+        self.addCleanup(cache._db.set_trace_callback, None)
+        return statements
+
+    def test_get_many_single_query(self):
+        """get_many читает ключи одним запросом и пропускает просроченные."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.cache.set('old', 3, timeout=0.05)
+        time.sleep(0.1)
+        statements = self.trace(self.cache)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'old', 'missing']),
+            {'a': 1, 'b': [2]})
+        selects = [sql for sql in statements if sql.startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertIsNone(self.cache.get('old'))
+
+    def test_set_many_single_transaction(self):
+        """set_many записывает все значения в одной транзакции."""
+        statements = self.trace(self.cache)
+        self.assertEqual(self.cache.set_many({'a': 1, 'b': 2, 'c': 3}), [])
+        self.assertEqual(statements.count('BEGIN IMMEDIATE'), 1)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2, 'c': 3})
+
+    def test_delete_many(self):
+        """delete_many удаляет только переданные ключи."""
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
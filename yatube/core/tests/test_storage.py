@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage
+from core.tests.test_thumbnails import SMALL_GIF, run_on_commit
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(TEMP_MEDIA_ROOT)
+                for name in names if not name.startswith('.')]
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое хранится одним файлом с двумя ссылками."""
+        first = self.storage.save('posts/a.txt', ContentFile(b'meme'))
+        second = self.storage.save('posts/b.TXT', ContentFile(b'meme'))
+        other = self.storage.save('posts/a.txt', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('posts/'))
+        self.assertTrue(first.endswith('.txt'))
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+        with self.storage.open(first) as stored:
+            self.assertEqual(stored.read(), b'meme')
+
+    def test_last_release_deletes_file(self):
+        """Файл удаляется вместе с последней ссылкой."""
+        name = self.storage.save('posts/a.txt', ContentFile(b'meme'))
+        self.storage.save('posts/b.txt', ContentFile(b'meme'))
+        self.assertFalse(self.storage.release(name))
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(self.storage.release(name))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_untracked_file_is_not_deleted(self):
+        """Файлы, которых нет в StoredFile, release не удаляет."""
+        file_system = super(ContentAddressedStorage, self.storage)
+        file_system._save('posts/old.txt', ContentFile(b'old'))
+        self.assertFalse(self.storage.release('posts/old.txt'))
+        self.assertTrue(self.storage.exists('posts/old.txt'))
+
+    def test_posts_share_image(self):
+        """Посты с одной картинкой делят файл до удаления последнего."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text='Мем',
+                image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'))
+            for name in ('meme.gif', 'meme-copy.gif')]
+        name = posts[0].image.name
+        self.assertEqual(posts[1].image.name, name)
+        run_on_commit()
+        posts[0].delete()
+        run_on_commit()
+        self.assertTrue(self.storage.exists(name))
+        posts[1].delete()
+        run_on_commit()
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(self.stored_files(), [])
+
+    def test_same_image_reuploaded(self):
+        """Повторная загрузка той же картинки не добавляет ссылку."""
+        post = Post.objects.create(
+            author=self.user, text='Мем',
+            image=SimpleUploadedFile('meme.gif', SMALL_GIF, 'image/gif'))
+        name = post.image.name
+        post.image = SimpleUploadedFile('again.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        run_on_commit()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        post.delete()
+        run_on_commit()
+        self.assertFalse(self.storage.exists(name))
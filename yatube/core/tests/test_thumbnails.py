@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.thumbnails import (
+    PlaceholderImage, image_formats, post_image_thumbnails)
+from posts.feed_cache import get_generation, post_scope
+from posts.management.commands.backfill_thumbnails import (
+    thumbnails_signature)
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+TEMPLATE = Template('{% load pictures %}{% picture image %}')
+
+PLACEHOLDER_TEMPLATE = Template(
+    '{% load pictures %}'
+    '{% picture post.image "" post.image_placeholder %}')
+
+PAGE_TEMPLATE = Template(
+    '{% load pictures %}{% prefetch_thumbnails posts %}'
+    '{% for post in posts %}{% picture post.image %}{% endfor %}')
+
+
+def run_on_commit():
+    """Выполняет отложенные до фиксации транзакции функции.
+
+    В TestCase транзакция не фиксируется, поэтому зовём их сами.
+    """
+    callbacks = [callback for _, callback in connection.run_on_commit]
+    connection.run_on_commit = []
+    for callback in callbacks:
+        callback()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, 'cache'), ignore_errors=True)
+        connection.run_on_commit = []
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def render(self):
+        return TEMPLATE.render(Context({'image': self.post.image}))
+
+    def thumbnail_files(self):
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        return [name for _, _, names in os.walk(directory) for name in names]
+
+    def test_template_does_not_generate_thumbnail(self):
+        """Без готовой миниатюры шаблон отдаёт заглушку и не создаёт файл."""
+        html = self.render()
+        self.assertIn(PlaceholderImage('960x339').url, html)
+        self.assertNotIn('srcset', html)
+        self.assertEqual(self.thumbnail_files(), [])
+
+    def test_upload_enqueues_thumbnails(self):
+        """После сохранения поста создаются все варианты картинки."""
+        run_on_commit()
+        self.assertEqual(
+            len(self.thumbnail_files()), len(post_image_thumbnails()))
+        html = self.render()
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', html)
+        self.assertIn(f'src="{settings.MEDIA_URL}cache/', html)
+
+    @override_settings(POST_IMAGE_MODERN_FORMATS=['WEBP'])
+    def test_modern_formats_get_source(self):
+        """Современный формат, который умеет Pillow, идёт в <source>."""
+        run_on_commit()
+        html = self.render()
+        if 'WEBP' in image_formats():
+            self.assertIn('<source type="image/webp"', html)
+        else:
+            self.assertNotIn('<source', html)
+
+    def test_image_preview_stored(self):
+        """Размеры и размытая заглушка картинки сохраняются у поста."""
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1))
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/png'))
+        html = PLACEHOLDER_TEMPLATE.render(Context({'post': self.post}))
+        self.assertIn(f'src="{self.post.image_placeholder}"', html)
+        run_on_commit()
+        html = PLACEHOLDER_TEMPLATE.render(Context({'post': self.post}))
+        self.assertIn(f'url({self.post.image_placeholder})', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_ready_thumbnails_reset_post_pages(self):
+        """Созданные миниатюры сбрасывают кеш страниц поста."""
+        scope = post_scope(self.post.pk)
+        generation = get_generation(scope)
+        run_on_commit()
+        self.assertNotEqual(get_generation(scope), generation)
+
+    def test_unchanged_image_is_not_enqueued(self):
+        """Правка текста не ставит миниатюры в очередь заново."""
+        run_on_commit()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(connection.run_on_commit, [])
+
+    def test_prefetch_batches_lookups(self):
+        """Миниатюры страницы находятся одним запросом к БД."""
+        for _ in range(2):
+            Post.objects.create(
+                author=self.user,
+                text='Тестовый пост',
+                image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+        run_on_commit()
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            html = PAGE_TEMPLATE.render(Context({'posts': posts}))
+        self.assertEqual(html.count('<picture>'), 3)
+        fresh = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            PAGE_TEMPLATE.render(Context({'posts': fresh}))
+
+    def test_backfill_command(self):
+        """Команда создаёт варианты картинок существующих постов."""
+        connection.run_on_commit = []
+        out = StringIO()
+        call_command('backfill_thumbnails', workers=1, stdout=out)
+        self.assertEqual(
+            len(self.thumbnail_files()), len(post_image_thumbnails()))
+        self.assertIn('Обработано картинок: 1. Ошибок: 0.', out.getvalue())
+
+    def test_backfill_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает после контрольной точки."""
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(buffer, 'GIF')
+        Post.objects.create(
+            author=self.user, text='Второй пост',
+            image=SimpleUploadedFile('red.gif', buffer.getvalue()))
+        connection.run_on_commit = []
+        first, second = sorted(
+            Post.objects.values_list('image', flat=True))
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint.json')
+        with open(checkpoint, 'w') as state:
+            json.dump({'signature': thumbnails_signature(), 'last': first,
+                       'done': 1, 'failed': 0}, state)
+        out = StringIO()
+        call_command('backfill_thumbnails', workers=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn(f'Продолжение после {first}', out.getvalue())
+        self.assertIn('Обработано картинок: 2. Ошибок: 0.', out.getvalue())
+        self.assertEqual(
+            len(self.thumbnail_files()), len(post_image_thumbnails()))
+        self.assertFalse(os.path.exists(checkpoint))
@@ -0,0 +1,271 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import (
+    DummyImageFile, ImageFile, deserialize_image_file)
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{x}" height="{y}">'
+    '<rect width="100%" height="100%" fill="#e9ecef"/></svg>')
+
+
+class PlaceholderImage(DummyImageFile):
+    """Серый прямоугольник нужного размера, пока миниатюры нет."""
+    @property
+    def url(self):
+        svg = PLACEHOLDER_SVG.format(x=self.x, y=self.y)
+        return 'data:image/svg+xml,' + quote(svg)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который не создаёт миниатюры во время запроса.
+
+    {% thumbnail %} получает готовый файл из хранилища ключей, а если
+    его ещё нет — заглушку; миниатюра ставится в очередь пула.
+    """
+    def _options(self, source, options):
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Файл, в котором лежит или будет лежать миниатюра."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options))
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None.
+
+        Сначала смотрит в ответы prefetch, сохранённые на самом файле.
+        """
+        ready = getattr(file_, '_ready_thumbnails', {})
+        lookup = _lookup_key(geometry_string, options)
+        if lookup in ready:
+            return ready[lookup]
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, options))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.get_ready_thumbnail(
+            file_, geometry_string, **options)
+        if thumbnail:
+            return thumbnail
+        enqueue(getattr(file_, 'name', file_),
+                [(geometry_string, options)],
+                getattr(file_, 'storage', None))
+        return PlaceholderImage(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        """Создаёт миниатюру, как это делает sorl по умолчанию."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def image_formats():
+    """Форматы вариантов: современные, которые умеет Pillow, и JPEG."""
+    modern = [image_format
+              for image_format in settings.POST_IMAGE_MODERN_FORMATS
+              if image_format.lower() in features.modules
+              and features.check_module(image_format.lower())]
+    return modern + ['JPEG']
+
+
+def post_image_variants():
+    """Варианты картинки поста: [(формат, ширина, геометрия, опции)]."""
+    base_width, base_height = settings.POST_IMAGE_SIZE
+    variants = []
+    for image_format in image_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * base_height / base_width)
+            options = {'crop': 'center', 'upscale': True,
+                       'format': image_format}
+            variants.append(
+                (image_format, width, f'{width}x{height}', options))
+    return variants
+
+
+def post_image_thumbnails():
+    """Миниатюры картинки поста для очереди и prefetch."""
+    return [(geometry_string, options)
+            for _, _, geometry_string, options in post_image_variants()]
+
+
+def _lookup_key(geometry_string, options):
+    return geometry_string, tuple(sorted(options.items()))
+
+
+def prefetch(files, thumbnails):
+    """Находит готовые миниатюры всех files разом.
+
+    Вместо запроса к кешу (и к БД при промахе) на каждый тег
+    {% thumbnail %} делает один get_many и один запрос к таблице
+    sorl. Ответы сохраняются на объектах файлов, поэтому живут,
+    пока живёт страница. Работает с хранилищем ключей cached_db.
+    """
+    kvstore = default.kvstore
+    backend = default.backend
+    if not (isinstance(kvstore, CachedDBKVStore)
+            and isinstance(backend, ReadyThumbnailBackend)):
+        return
+    wanted = {}
+    for file_ in files:
+        if not file_:
+            continue
+        for geometry_string, options in thumbnails:
+            thumbnail = backend.thumbnail_file(file_, geometry_string, options)
+            wanted[add_prefix(thumbnail.key)] = (
+                file_, _lookup_key(geometry_string, options))
+    if not wanted:
+        return
+    found = kvstore.cache.get_many(list(wanted))
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+        loaded = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(loaded)
+    for key, (file_, lookup) in wanted.items():
+        value = found[key]
+        thumbnail = None if value == EMPTY_VALUE else (
+            deserialize_image_file(value))
+        ready = file_.__dict__.setdefault('_ready_thumbnails', {})
+        ready[lookup] = thumbnail
+
+
+_lock = threading.Lock()
+_executor = None
+# Файлы в очереди и то, что вызвать после создания их миниатюр.
+_pending = {}
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def _task_key(name, thumbnails):
+    return name, repr(thumbnails)
+
+
+def generate(name, thumbnails, storage=None):
+    """Создаёт миниатюры файла name: [(геометрия, опции), ...].
+
+    storage — хранилище файла (по умолчанию — хранилище sorl); от него
+    зависят ключи миниатюр. Возвращает False, если создать
+    не удалось; ошибка пишется в лог.
+    """
+    backend = default.backend
+    source = ImageFile(name, storage)
+    try:
+        for geometry_string, options in thumbnails:
+            if isinstance(backend, ReadyThumbnailBackend):
+                backend.generate(source, geometry_string, **options)
+            else:
+                backend.get_thumbnail(source, geometry_string, **options)
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return False
+
+
+def _process(name, thumbnails, storage):
+    key = _task_key(name, thumbnails)
+    try:
+        created = generate(name, thumbnails, storage)
+    finally:
+        with _lock:
+            callbacks = _pending.pop(key, [])
+    if not created:
+        return
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception('Ошибка после создания миниатюр %s', name)
+
+
+def _run(name, thumbnails, storage):
+    try:
+        _process(name, thumbnails, storage)
+    finally:
+        # У потока пула своё соединение с БД (хранилище ключей sorl).
+        connection.close()
+
+
+def enqueue(name, thumbnails, storage=None, on_ready=None):
+    """Ставит создание миниатюр в очередь после фиксации транзакции.
+
+    Повторная постановка того же файла, пока он в очереди, ничего
+    не делает. on_ready вызывается, когда миниатюры созданы
+    (в потоке пула), — например, чтобы сбросить кеш страниц,
+    сохранённых с заглушками. При THUMBNAIL_WORKERS = 0 миниатюры
+    создаются сразу.
+    """
+    key = _task_key(name, thumbnails)
+
+    def submit():
+        with _lock:
+            callbacks = _pending.get(key)
+            if callbacks is not None:
+                if on_ready is not None:
+                    callbacks.append(on_ready)
+                return
+            _pending[key] = [on_ready] if on_ready is not None else []
+        if settings.THUMBNAIL_WORKERS:
+            _get_executor().submit(_run, name, thumbnails, storage)
+        else:
+            _process(name, thumbnails, storage)
+    transaction.on_commit(submit)
+
+
+def release_image(storage, name):
+    """Отпускает картинку после фиксации транзакции.
+
+    В хранилище core.storage убирает ссылку на файл; вместе
+    с последней ссылкой удаляются и миниатюры картинки.
+    """
+    if not name or not hasattr(storage, 'release'):
+        return
+
+    def release():
+        if storage.release(name):
+            default.backend.delete(ImageFile(name, storage), delete_file=False)
+    transaction.on_commit(release)
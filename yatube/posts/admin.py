@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Post, Group
+from .search import filter_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +16,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идёт по индексу posts.search, а не LIKE по всей таблице.
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
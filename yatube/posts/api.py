@@ -0,0 +1,171 @@
+import codecs
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+
+from .feed import CURSOR_LOOKUPS, feed_posts
+from .importer import READERS, PostImporter
+from .models import Group, Post, User
+from .paginator import CURSOR_PARAM, CursorPaginator
+
+# Поле ответа -> столбец выборки. Строки читаются через values_list,
+# без создания объектов моделей.
+FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_placeholder': 'image_placeholder',
+}
+DEFAULT_FIELDS = ['id', 'text', 'pub_date', 'author', 'group', 'image']
+
+IMPORT_FORMATS = {
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'text/csv': 'csv',
+}
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error(message, status=400):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def parse_fields(request):
+    """Поля из ?fields=id,text,author; без параметра — DEFAULT_FIELDS."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = list(dict.fromkeys(
+        field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown or not fields:
+        raise BadRequest(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(FIELDS)}.')
+    return fields
+
+
+def parse_limit(request):
+    raw = request.GET.get('limit')
+    if raw is None:
+        return settings.LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    return min(max(limit, 1), settings.API_MAX_LIMIT)
+
+
+def make_converters(fields):
+    """Функции, превращающие значение столбца в значение JSON."""
+    storage = Post._meta.get_field('image').storage
+    converters = {
+        'pub_date': lambda value: value.isoformat(),
+        'image': lambda value: storage.url(value) if value else None,
+    }
+    return [(field, FIELDS[field], converters.get(field))
+            for field in fields]
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def posts_response(request, post_list, lookups=None):
+    """Страница постов в JSON: только запрошенные поля и курсоры.
+
+    lookups — выражения ключа курсора (см. CursorPaginator).
+    """
+    try:
+        fields = parse_fields(request)
+        limit = parse_limit(request)
+    except BadRequest as bad_request:
+        return error(str(bad_request))
+    converters = make_converters(fields)
+    columns = list(dict.fromkeys(
+        ['pk', 'pub_date'] + [column for _, column, _ in converters]))
+    rows = post_list.values_list(*columns, named=True)
+    page = CursorPaginator(rows, limit, lookups=lookups).get_page(
+        request.GET.get(CURSOR_PARAM))
+    results = []
+    for row in page:
+        item = {}
+        for field, column, convert in converters:
+            value = getattr(row, column)
+            item[field] = convert(value) if convert else value
+        results.append(item)
+    return JsonResponse({
+        'results': results,
+        'next': page_url(request, page.next_cursor()),
+        'previous': page_url(request, page.previous_cursor()),
+    }, json_dumps_params=JSON_PARAMS)
+
+
+def index(request):
+    """Все посты."""
+    return posts_response(request, Post.objects.all())
+
+
+def group_posts(request, slug):
+    """Посты группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return posts_response(request, group.posts.all())
+
+
+def profile(request, username):
+    """Посты автора."""
+    author = get_object_or_404(User, username=username)
+    return posts_response(request, author.posts.all())
+
+
+def follow_index(request):
+    """Лента подписок посетителя."""
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', status=401)
+    return posts_response(
+        request, feed_posts(request.user), lookups=CURSOR_LOOKUPS)
+
+
+@require_POST
+def import_posts(request):
+    """Загрузка своих постов пачкой: тело запроса — JSONL или CSV.
+
+    Тело читается потоком и пишется пачками, как в команде
+    import_posts; картинки так не загружаются.
+    """
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', status=401)
+    file_format = IMPORT_FORMATS.get(request.content_type)
+    if file_format is None:
+        return error(
+            f'Тело должно быть в формате {", ".join(IMPORT_FORMATS)}.',
+            status=415)
+    lines = codecs.iterdecode(request, request.encoding or 'utf-8')
+    importer = PostImporter(author=request.user)
+    try:
+        importer.run(READERS[file_format](lines))
+    except UnicodeDecodeError:
+        return error('Тело запроса не в UTF-8.')
+    return JsonResponse({
+        'created': importer.created,
+        'failed': importer.failed,
+        'errors': [{'line': number, 'error': message}
+                   for number, message in importer.errors],
+    }, json_dumps_params=JSON_PARAMS)
@@ -0,0 +1,182 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .feed_cache import NAMES, bump_generation, get_generation
+from .models import Group, User
+
+USER = 'user'
+GROUP = 'group'
+
+
+class PrefixIndex:
+    """Отсортированный список ключей с поиском по префиксу.
+
+    Ключ — имя в нижнем регистре; у одного объекта их может быть
+    несколько (название и slug группы). Поиск — bisect до первого
+    подходящего ключа и проход вперёд, пока ключи начинаются
+    с префикса.
+    """
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, kind, pk, names, value):
+        self.remove(kind, pk)
+        keys = sorted({name.lower() for name in names if name})
+        for key in keys:
+            insort(self._keys, (key, kind, pk))
+        self._items[kind, pk] = (keys, value)
+
+    def remove(self, kind, pk):
+        keys, _ = self._items.pop((kind, pk), ((), None))
+        for key in keys:
+            position = bisect_left(self._keys, (key, kind, pk))
+            if self._keys[position:position + 1] == [(key, kind, pk)]:
+                del self._keys[position]
+
+    def value(self, kind, pk):
+        return self._items.get((kind, pk), (None, None))[1]
+
+    def lookup(self, prefix, limit):
+        prefix = prefix.lower()
+        found = []
+        position = bisect_left(self._keys, (prefix,))
+        while len(found) < limit and position < len(self._keys):
+            key, kind, pk = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            if (kind, pk) not in found:
+                found.append((kind, pk))
+            position += 1
+        return [(kind, self._items[kind, pk][1]) for kind, pk in found]
+
+
+# Журнал изменений: запись на каждое поколение NAMES. Другие процессы
+# проигрывают его вместо перестроения индекса по БД.
+CHANGE_KEY = 'autocomplete:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+# Отставание, после которого дешевле перестроить индекс целиком.
+MAX_REPLAY = 100
+
+_lock = threading.Lock()
+_index = PrefixIndex()
+_generation = None
+_checked = None
+
+
+def _build():
+    index = PrefixIndex()
+    users = User.objects.values_list('pk', 'username')
+    for pk, username in users.iterator():
+        index.add(USER, pk, [username], (username, username))
+    groups = Group.objects.values_list('pk', 'title', 'slug')
+    for pk, title, slug in groups.iterator():
+        index.add(GROUP, pk, [title, slug], (title, slug))
+    return index
+
+
+def _apply(index, change):
+    action, kind, pk, *rest = change
+    if action == 'add':
+        index.add(kind, pk, *rest)
+    else:
+        index.remove(kind, pk)
+
+
+def _catch_up(generation):
+    """Догоняет поколение generation по журналу или перестроением.
+
+    Вызывается под _lock.
+    """
+    global _index, _generation
+    if _generation is not None and (
+            0 < generation - _generation <= MAX_REPLAY):
+        keys = [CHANGE_KEY.format(number)
+                for number in range(_generation + 1, generation + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) == len(keys):
+            for key in keys:
+                _apply(_index, changes[key])
+            _generation = generation
+            return
+    _index, _generation = _build(), generation
+
+
+def lookup(prefix, limit=None):
+    """Пользователи и группы, имя которых начинается с prefix.
+
+    Индекс живёт в памяти процесса. Поколение NAMES в общем кеше
+    сверяется не чаще раза в AUTOCOMPLETE_REFRESH_INTERVAL секунд;
+    изменения других процессов проигрываются по журналу, и только
+    при большом отставании индекс перестраивается по БД.
+    """
+    global _checked
+    limit = limit or settings.AUTOCOMPLETE_LIMIT
+    now = time.monotonic()
+    with _lock:
+        if (_checked is None or now - _checked
+                >= settings.AUTOCOMPLETE_REFRESH_INTERVAL):
+            _checked = now
+            generation = int(get_generation(NAMES))
+            if generation != _generation:
+                _catch_up(generation)
+        found = _index.lookup(prefix, limit)
+    results = []
+    for kind, (label, arg) in found:
+        view = 'posts:profile' if kind == USER else 'posts:group_list'
+        results.append(
+            {'type': kind, 'label': label, 'url': reverse(view, args=[arg])})
+    return results
+
+
+def _publish(change):
+    """Записывает изменение в журнал под новым поколением NAMES."""
+    generation, = bump_generation(NAMES)
+    cache.set(CHANGE_KEY.format(generation), change, CHANGE_TIMEOUT)
+    return generation
+
+
+def _change(change):
+    """Публикует изменение после фиксации транзакции.
+
+    Индекс процесса правится на месте; если он отставал, то догонит
+    журнал при следующей сверке. Откаченные изменения в журнал
+    не попадают.
+    """
+    def publish():
+        global _generation
+        generation = _publish(change)
+        with _lock:
+            if _generation == generation - 1:
+                _apply(_index, change)
+                _generation = generation
+    transaction.on_commit(publish)
+
+
+def user_changed(user):
+    if _index.value(USER, user.pk) == (user.username, user.username):
+        return
+    _change(('add', USER, user.pk, [user.username],
+             (user.username, user.username)))
+
+
+def user_deleted(user_id):
+    _change(('remove', USER, user_id))
+
+
+def group_changed(group):
+    _change(('add', GROUP, group.pk, [group.title, group.slug],
+             (group.title, group.slug)))
+
+
+def group_deleted(group_id):
+    _change(('remove', GROUP, group_id))
@@ -0,0 +1,72 @@
+import csv
+import json
+
+from .models import Comment, Post
+
+FIELDS = ['type', 'id', 'date', 'group', 'post', 'text', 'image']
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(user):
+    """Посты и комментарии пользователя словарями, без объектов моделей.
+
+    Строки читаются курсором порциями по CHUNK_SIZE, поэтому память
+    не зависит от числа записей.
+    """
+    storage = Post._meta.get_field('image').storage
+    posts = (Post.objects.filter(author=user).order_by('pk')
+             .values_list('pk', 'pub_date', 'group__slug', 'text', 'image'))
+    for pk, pub_date, group, text, image in posts.iterator(CHUNK_SIZE):
+        yield {'type': 'post', 'id': pk, 'date': pub_date.isoformat(),
+               'group': group, 'post': None, 'text': text,
+               'image': storage.url(image) if image else None}
+    comments = (Comment.objects.filter(author=user).order_by('pk')
+                .values_list('pk', 'created', 'post_id', 'text'))
+    for pk, created, post_id, text in comments.iterator(CHUNK_SIZE):
+        yield {'type': 'comment', 'id': pk, 'date': created.isoformat(),
+               'group': None, 'post': post_id, 'text': text,
+               'image': None}
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку, а не пишет её."""
+    def write(self, value):
+        return value
+
+
+def as_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def as_csv(rows):
+    writer = csv.DictWriter(Echo(), FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    """Склеивает мелкие куски в блоки около size символов."""
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export(user, file_format):
+    """Поток кусков текста выгрузки в формате file_format."""
+    serialize = as_csv if file_format == 'csv' else as_jsonl
+    return buffered(serialize(export_rows(user)))
@@ -0,0 +1,297 @@
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .stats import find_stats, get_stats
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Подписчиков в одной транзакции при возврате автора к рассылке.
+FOLLOWER_BATCH_SIZE = 100
+
+
+def is_pull_author(author_id):
+    """Посты автора с большим числом подписчиков не рассылаются.
+
+    Такие посты читатели забирают сами при открытии ленты.
+    """
+    return get_stats(author_id).pull_feed
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    follower_ids = (Follow.objects.filter(author_id=post.author_id)
+                    .values_list('user_id', flat=True).distinct())
+    entries = (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+               for user_id in follower_ids.iterator())
+    _bulk_insert(entries)
+
+
+def fan_out_posts(posts):
+    """Раскладывает пачку новых постов; подписчики читаются раз на автора."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    for author_id, author_posts in by_author.items():
+        if is_pull_author(author_id):
+            continue
+        follower_ids = list(
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True).distinct())
+        _bulk_insert(
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for post in author_posts for user_id in follower_ids)
+
+
+def backfill_follow(follow):
+    """Добавляет в ленту подписчика уже опубликованные посты автора.
+
+    Автор, у которого подписчиков стало больше
+    FEED_PUSH_FOLLOWER_LIMIT, переводится на чтение по запросу.
+    """
+    stats = get_stats(follow.author_id)
+    if (not stats.pull_feed and stats.followers_count
+            > settings.FEED_PUSH_FOLLOWER_LIMIT):
+        AuthorStats.objects.filter(user_id=follow.author_id).update(
+            pull_feed=True)
+        return
+    if stats.pull_feed:
+        return
+    _backfill(follow.user_id, follow.author_id)
+
+
+def trim_follow(follow):
+    """Убирает посты автора из ленты после отписки.
+
+    Если у популярного автора подписчиков осталось не больше
+    FEED_PUSH_RESUME_FOLLOWER_LIMIT, он возвращается к рассылке
+    (см. resume_push).
+    """
+    followers = Follow.objects.filter(author_id=follow.author_id)
+    if not followers.filter(user_id=follow.user_id).exists():
+        FeedEntry.objects.filter(
+            user_id=follow.user_id,
+            post__author_id=follow.author_id).delete()
+    stats = find_stats(follow.author_id)
+    if stats is None or not stats.pull_feed:
+        return
+    if stats.followers_count <= settings.FEED_PUSH_RESUME_FOLLOWER_LIMIT:
+        resume_push(follow.author_id)
+
+
+_lock = threading.Lock()
+_executor = None
+_pending = set()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_WORKERS,
+                thread_name_prefix='feed')
+        return _executor
+
+
+def _run_push(author_id):
+    try:
+        push_author(author_id)
+    except Exception:
+        logger.exception('Не удалось вернуть к рассылке автора %s', author_id)
+    finally:
+        with _lock:
+            _pending.discard(author_id)
+        connection.close()
+
+
+def resume_push(author_id):
+    """Ставит возврат автора к рассылке в очередь пула.
+
+    Задача уходит в пул после фиксации транзакции; повторная
+    постановка, пока автор в очереди, ничего не делает.
+    При FEED_WORKERS = 0 ленты заполняются сразу.
+    """
+    if not settings.FEED_WORKERS:
+        push_author(author_id)
+        return
+
+    def submit():
+        with _lock:
+            if author_id in _pending:
+                return
+            _pending.add(author_id)
+        _get_executor().submit(_run_push, author_id)
+    transaction.on_commit(submit)
+
+
+def push_author(author_id):
+    """Раскладывает посты автора по лентам и включает ему рассылку.
+
+    Пока ленты заполняются пачками подписчиков (каждая в своей
+    транзакции), читатели по-прежнему получают посты автора
+    по запросу. Рассылка включается в конце, после чего
+    доразмещаются посты и подписки, появившиеся за это время.
+    """
+    followers = Follow.objects.filter(author_id=author_id)
+    posts = Post.objects.filter(author_id=author_id)
+    last_follow = followers.aggregate(last=Max('pk'))['last'] or 0
+    last_post = posts.aggregate(last=Max('pk'))['last'] or 0
+    batches = followers.filter(pk__lte=last_follow).order_by('pk')
+    position = 0
+    while True:
+        batch = list(batches.filter(pk__gt=position)
+                     .values_list('pk', 'user_id')[:FOLLOWER_BATCH_SIZE])
+        if not batch:
+            break
+        user_ids = [user_id for _, user_id in batch]
+        rows = posts.filter(pk__lte=last_post).values_list('pk', 'pub_date')
+        with transaction.atomic():
+            _bulk_insert(
+                FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for pk, pub_date in rows.iterator() for user_id in user_ids)
+        position = batch[-1][0]
+    resumed = AuthorStats.objects.filter(
+        user_id=author_id, pull_feed=True,
+        followers_count__lte=settings.FEED_PUSH_RESUME_FOLLOWER_LIMIT,
+    ).update(pull_feed=False)
+    if not resumed:
+        return
+    user_ids = (followers.filter(pk__gt=last_follow)
+                .values_list('user_id', flat=True))
+    for user_id in user_ids:
+        _backfill(user_id, author_id)
+    fan_out_posts(posts.filter(pk__gt=last_post))
+
+
+def pull_author_ids(user):
+    """Популярные авторы, на которых подписан user."""
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return list(
+        AuthorStats.objects.filter(user_id__in=followed, pull_feed=True)
+        .values_list('user_id', flat=True))
+
+
+# Ключ курсора ленты: столбцы FeedEntry, чтобы поиск позиции
+# и сортировка шли по индексу feed_user_pub_date_idx. Значения
+# совпадают с pub_date и id поста.
+CURSOR_LOOKUPS = ('feed_pub_date', 'feed_post_id')
+
+
+def feed_posts(user):
+    """Посты ленты подписок в порядке публикации.
+
+    Посты обычных авторов читаются из разосланной ленты, посты
+    популярных — прямо из Post; два потока сливаются при чтении.
+    Курсорной пагинации нужны lookups=CURSOR_LOOKUPS.
+    """
+    pushed = (Post.objects.filter(feed_entries__user=user)
+              .annotate(feed_pub_date=F('feed_entries__pub_date'),
+                        feed_post_id=F('feed_entries__post'))
+              .order_by('-feed_pub_date', '-feed_post_id'))
+    pull_ids = pull_author_ids(user)
+    if not pull_ids:
+        return pushed
+    pulled = (Post.objects.filter(author_id__in=pull_ids)
+              .annotate(feed_pub_date=F('pub_date'), feed_post_id=F('pk'))
+              .order_by('-feed_pub_date', '-feed_post_id'))
+    return MergedFeed(pushed.exclude(author_id__in=pull_ids), pulled)
+
+
+class MergedFeed:
+    """Слияние нескольких упорядоченных выборок постов.
+
+    Поддерживает то подмножество API QuerySet, которым пользуются
+    пагинаторы и API: count(), срезы, filter(), order_by(),
+    select_related(), values_list().
+    Потоки не должны пересекаться. Сливаются они по атрибутам
+    pub_date и pk строк, а порядок сортировки (order_by) задаёт
+    только направление: ключ ленты CURSOR_LOOKUPS совпадает
+    с ними по значению, а в строках values_list его может не быть.
+
+    Срез [a:b] читает из каждого потока b строк, поэтому номерные
+    страницы дорожают с глубиной; cursor_only просит post_paginator
+    листать такую ленту курсором.
+    """
+    ordered = True
+    cursor_only = True
+
+    def __init__(self, *querysets, ordering=('-pub_date', '-pk')):
+        self.querysets = querysets
+        self.ordering = ordering
+
+    def _clone(self, method, *args, **kwargs):
+        return MergedFeed(
+            *(getattr(queryset, method)(*args, **kwargs)
+              for queryset in self.querysets),
+            ordering=self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._clone('exclude', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._clone('select_related', *fields)
+
+    def values_list(self, *fields, **kwargs):
+        return self._clone('values_list', *fields, **kwargs)
+
+    def order_by(self, *fields):
+        merged = self._clone('order_by', *fields)
+        merged.ordering = fields
+        return merged
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop
+        streams = self.querysets
+        if stop is not None:
+            streams = [queryset[:stop] for queryset in streams]
+        merged = heapq.merge(
+            *streams,
+            key=attrgetter('pub_date', 'pk'),
+            reverse=self.ordering[0].startswith('-'))
+        return list(merged)[start:stop]
+
+
+def _backfill(user_id, author_id):
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', 'pub_date'))
+    entries = (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+               for pk, pub_date in posts.iterator())
+    _bulk_insert(entries)
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
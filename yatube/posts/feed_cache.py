@@ -0,0 +1,120 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Group, Post, User
+
+GENERATION_KEY = 'posts:generation:{}'
+
+# Области, за изменениями которых следят кеши страниц и валидаторы:
+# FEED — вся лента, GROUPS — любая группа, NAMES — имена пользователей
+# и групп для автодополнения, остальные — один объект.
+FEED = 'feed'
+GROUPS = 'groups'
+NAMES = 'names'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follows_scope(user_id):
+    return f'follows:{user_id}'
+
+
+def _seed_generation(key):
+    """Заводит поколение для ключа, которого нет в кеше.
+
+    Ключ мог быть вытеснен при чистке кеша, поэтому начальное значение
+    берётся из часов, а не 1: иначе вернулись бы старые страницы
+    с ключами и ETag прежнего поколения.
+    """
+    generation = time.time_ns()
+    cache.add(key, generation, timeout=None)
+    return cache.get(key, generation)
+
+
+def get_generations(*scopes):
+    """Поколения областей одной строкой: входит в ключи кеша и ETag."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            found[key] = _seed_generation(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def get_generation(scope=FEED):
+    """Текущее поколение области scope."""
+    return get_generations(scope)
+
+
+def bump_generation(*scopes):
+    """Сбрасывает кеши, зависящие от областей scopes, сменой поколения.
+
+    Возвращает новые поколения областей.
+    """
+    generations = []
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            generations.append(cache.incr(key))
+        except ValueError:
+            generations.append(_seed_generation(key))
+    return generations
+
+
+def post_scopes(post):
+    """Области, которые затрагивает изменение поста."""
+    scopes = [FEED, author_scope(post.author_id), post_scope(post.pk)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def index_version(request):
+    return get_generations(FEED, GROUPS)
+
+
+def group_version(request, slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('pk', flat=True).first())
+    if group_id is None:
+        return None
+    return get_generations(group_scope(group_id), GROUPS)
+
+
+def profile_version(request, username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    if author_id is None:
+        return None
+    return get_generations(author_scope(author_id), GROUPS)
+
+
+def post_detail_version(request, post_id):
+    author_id = (Post.objects.filter(pk=post_id)
+                 .values_list('author_id', flat=True).first())
+    if author_id is None:
+        return None
+    return get_generations(
+        post_scope(post_id), author_scope(author_id), GROUPS)
+
+
+def comments_version(request, post_id):
+    return get_generations(post_scope(post_id))
+
+
+def personal_version(request):
+    """Поколение данных посетителя, от которых зависят его фрагменты."""
+    if not request.user.is_authenticated:
+        return None
+    return get_generations(follows_scope(request.user.pk))
@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from core.images import ingest_image
 from .models import Post, Comment
 
 
@@ -8,6 +11,13 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённую картинку поста проверять не нужно.
+        if isinstance(image, UploadedFile):
+            image = ingest_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """Форма создания комментария."""
@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+
+from core import thumbnails
+from core.images import ingest_image
+from . import feed, feed_cache, search, stats
+from .models import Group, Post, User
+from .signals import describe_image
+
+# Сколько ошибок держать для отчёта; остальные только считаются.
+MAX_ERRORS = 100
+
+
+class RowError(Exception):
+    pass
+
+
+def read_jsonl(lines):
+    """Строки JSONL -> (номер строки, словарь)."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def read_csv(lines):
+    """Строки CSV с заголовком -> (номер строки, словарь)."""
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        yield number, row
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+class PostImporter:
+    """Потоковая загрузка постов пачками через bulk_create.
+
+    Пачка проверяется двумя запросами (авторы и группы) и пишется
+    в своей транзакции, поэтому память и длина транзакции не зависят
+    от размера файла. Что при сохранении поста делают сигналы
+    (счётчики, рассылка по лентам, поиск, миниатюры, сброс кешей),
+    здесь делается разом на всю пачку.
+
+    author — единственный допустимый автор (для загрузки через API);
+    image_root — каталог, в котором ищутся картинки; без него поле
+    image запрещено.
+    """
+    def __init__(self, author=None, image_root=None, batch_size=500):
+        self.author = author
+        self.image_root = image_root and os.path.realpath(image_root)
+        self.batch_size = batch_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return self
+            self.import_batch(batch)
+
+    def error(self, number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((number, message))
+
+    def import_batch(self, batch):
+        usernames = {row.get('author') for _, row in batch if row}
+        slugs = {row.get('group') for _, row in batch if row}
+        if self.author is not None:
+            users = {self.author.username: self.author.pk}
+        else:
+            users = dict(User.objects.filter(username__in=usernames)
+                         .values_list('username', 'pk'))
+        groups = dict(Group.objects.filter(slug__in=slugs)
+                      .values_list('slug', 'pk'))
+        # Картинки разбираются и сохраняются до транзакции: запись
+        # в SQLite блокируется только на вставку строк и счётчиков.
+        posts = []
+        for number, row in batch:
+            try:
+                posts.append(self.build(row, users, groups))
+            except RowError as row_error:
+                self.error(number, str(row_error))
+        if not posts:
+            return
+        try:
+            with transaction.atomic():
+                self.insert(posts)
+        except BaseException:
+            for post in posts:
+                thumbnails.release_image(
+                    post.image.storage, post.image.name)
+            raise
+        self.created += len(posts)
+
+    def build(self, row, users, groups):
+        if row is None:
+            raise RowError('Строка не разобрана.')
+        text = (row.get('text') or '').strip()
+        if not text:
+            raise RowError('Пустой текст.')
+        username = row.get('author') or (
+            self.author.username if self.author else '')
+        if self.author is not None and username != self.author.username:
+            raise RowError('Можно загружать только свои посты.')
+        if username not in users:
+            raise RowError(f'Нет автора {username!r}.')
+        slug = row.get('group') or None
+        if slug is not None and slug not in groups:
+            raise RowError(f'Нет группы {slug!r}.')
+        post = Post(text=text, author_id=users[username],
+                    group_id=groups.get(slug))
+        if row.get('image'):
+            self.attach_image(post, row['image'])
+        return post
+
+    def attach_image(self, post, path):
+        if not self.image_root:
+            raise RowError('Картинки здесь не принимаются.')
+        full_path = os.path.realpath(os.path.join(self.image_root, path))
+        if os.path.commonpath([full_path, self.image_root]) != (
+                self.image_root):
+            raise RowError(f'Картинка {path!r} вне каталога картинок.')
+        try:
+            with open(full_path, 'rb') as image:
+                upload = ingest_image(
+                    File(image, name=os.path.basename(full_path)))
+                post.image.save(upload.name, upload, save=False)
+        except OSError:
+            raise RowError(f'Не удалось прочитать картинку {path!r}.')
+        except ValidationError as invalid:
+            raise RowError(f'{path}: {" ".join(invalid.messages)}')
+        describe_image(post)
+        post.image.close()
+
+    def insert(self, posts):
+        Post.objects.bulk_create(posts)
+        if posts[0].pk is None:
+            # SQLite не возвращает id из bulk_create. Запись в таблицу
+            # заблокирована с первого INSERT транзакции, поэтому
+            # последние len(posts) id — наши, в порядке вставки.
+            ids = list(Post.objects.order_by('-pk')
+                       .values_list('pk', flat=True)[:len(posts)])
+            for post, pk in zip(posts, reversed(ids)):
+                post.pk = pk
+        for author_id, count in Counter(
+                post.author_id for post in posts).items():
+            stats.change(author_id, 'posts_count', count)
+        feed.fan_out_posts(posts)
+        search.index_posts(posts)
+        for post in posts:
+            if post.image:
+                thumbnails.enqueue(
+                    post.image.name, thumbnails.post_image_thumbnails(),
+                    post.image.storage)
+        scopes = {feed_cache.FEED}
+        for post in posts:
+            scopes.add(feed_cache.author_scope(post.author_id))
+            if post.group_id:
+                scopes.add(feed_cache.group_scope(post.group_id))
+        feed_cache.bump_generation(*scopes)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.thumbnails import generate, post_image_thumbnails
+from posts.models import Post
+
+
+def backfill_image(name):
+    storage = Post._meta.get_field('image').storage
+    return generate(name, post_image_thumbnails(), storage)
+
+
+def thumbnails_signature():
+    """Отпечаток набора миниатюр, с которым сверяется контрольная точка."""
+    raw = json.dumps(post_image_thumbnails(), sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = ('Создаёт все варианты картинок существующих постов '
+            'в несколько процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 1 — без пула.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=8,
+            help='Сколько картинок отдавать процессу за раз.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько имён картинок читать из БД за раз.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки: после каждой пачки в него '
+                 'пишется прогресс, а повторный запуск с тем же файлом '
+                 'продолжает с места остановки.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на контрольную точку.')
+
+    def handle(self, *args, **options):
+        self.checkpoint = options['checkpoint']
+        state = self.load_checkpoint(options['restart'])
+        names = (Post.objects.exclude(image='').order_by('image')
+                 .values_list('image', flat=True).distinct())
+        total = names.count()
+        if state['last']:
+            self.stdout.write(
+                f'Продолжение после {state["last"]}: '
+                f'уже обработано {state["done"]}.')
+        pool = None
+        if options['workers'] > 1:
+            # Дочерние процессы не должны делить соединение родителя.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            pool = context.Pool(options['workers'])
+        started = time.monotonic()
+        processed = 0
+        try:
+            while True:
+                batch = list(names.filter(image__gt=state['last'])
+                             [:options['batch_size']])
+                if not batch:
+                    break
+                if pool is not None:
+                    results = list(pool.imap_unordered(
+                        backfill_image, batch, options['chunk_size']))
+                else:
+                    results = [backfill_image(name) for name in batch]
+                processed += len(results)
+                state['done'] += len(results)
+                state['failed'] += results.count(False)
+                state['last'] = batch[-1]
+                self.save_checkpoint(state)
+                rate = processed / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'{state["done"]} из {total} '
+                    f'({state["done"] / max(total, 1):.0%}), '
+                    f'{rate:.1f} картинок/с, ошибок: {state["failed"]}.')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Обработано картинок: {state["done"]}. '
+            f'Ошибок: {state["failed"]}. '
+            f'Время: {elapsed:.1f} с.')
+
+    def load_checkpoint(self, restart):
+        state = {'signature': thumbnails_signature(),
+                 'last': '', 'done': 0, 'failed': 0}
+        if restart or not self.checkpoint:
+            return state
+        try:
+            with open(self.checkpoint) as checkpoint:
+                saved = json.load(checkpoint)
+        except FileNotFoundError:
+            return state
+        if saved.get('signature') != state['signature']:
+            self.stdout.write(
+                'Набор миниатюр изменился, контрольная точка не годится.')
+            return state
+        return saved
+
+    def save_checkpoint(self, state):
+        if not self.checkpoint:
+            return
+        # Запись через временный файл: прерванный прогон
+        # не оставит точку наполовину записанной.
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temporary, self.checkpoint)
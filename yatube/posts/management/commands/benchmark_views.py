@@ -0,0 +1,193 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Group, Post
+
+METRICS = ('p50', 'p95', 'queries', 'memory')
+# Тексты, по которым после замеров находятся созданные ими записи.
+POST_TEXT = 'Пост из замера'
+COMMENT_TEXT = 'Комментарий из замера'
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Гоняет основные страницы через тестовый клиент и сравнивает '
+            'задержку, число запросов и память с сохранённым эталоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Замеров на страницу.')
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Запросов на страницу до замеров.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Сначала наполнить базу командой generate_data.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline', help='JSON эталона для сравнения.')
+        parser.add_argument(
+            '--save-baseline', help='Куда записать результат как эталон.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост задержки и памяти, доля от эталона.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если есть ухудшения.')
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            call_command('generate_data', seed=options['seed'],
+                         stdout=self.stdout)
+        self.options = options
+        user, targets = self.targets()
+        # Замеры идут без общей транзакции: иначе транзакции views
+        # стали бы точками сохранения с лишними запросами. Созданное
+        # замерами удаляется после них; записи, которые в это время
+        # добавили настоящие пользователи, остаются.
+        last_post = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        last_comment = (
+            Comment.objects.aggregate(last=Max('pk'))['last'] or 0)
+        try:
+            # Панель отладки и журнал запросов DEBUG искажали бы замеры.
+            with override_settings(DEBUG=False, INTERNAL_IPS=[]):
+                results = self.run_all(user, targets)
+        finally:
+            Comment.objects.filter(
+                pk__gt=last_comment, author=user, text=COMMENT_TEXT,
+            ).delete()
+            Post.objects.filter(
+                pk__gt=last_post, author=user, text=POST_TEXT,
+            ).delete()
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+        regressions = self.report(results, baseline)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Ухудшений: {regressions}.')
+
+    def targets(self):
+        """Страницы и запросы к ним на самых нагруженных данных."""
+        stats = AuthorStats.objects.order_by
+        reader = stats('-following_count').first()
+        author = stats('-posts_count').first()
+        group = (Group.objects.annotate(total=Count('posts'))
+                 .order_by('-total').first())
+        post = (Post.objects.annotate(total=Count('comments'))
+                .order_by('-total').first())
+        if not (reader and author and group and post):
+            raise CommandError(
+                'Нужны пользователи, группы и посты: '
+                'запустите generate_data или добавьте --generate.')
+        return reader.user, [
+            ('index', 'get', reverse('posts:index'), None),
+            ('group_posts', 'get',
+             reverse('posts:group_list', args=[group.slug]), None),
+            ('profile', 'get',
+             reverse('posts:profile', args=[author.user.username]), None),
+            ('post_detail', 'get',
+             reverse('posts:post_detail', args=[post.pk]), None),
+            ('follow_index', 'get', reverse('posts:follow_index'), None),
+            ('post_create', 'post', reverse('posts:post_create'),
+             {'text': POST_TEXT}),
+            ('add_comment', 'post',
+             reverse('posts:add_comment', args=[post.pk]),
+             {'text': COMMENT_TEXT}),
+        ]
+
+    def run_all(self, user, targets):
+        client = Client()
+        client.force_login(user)
+        return {name: self.measure(client, method, url, data)
+                for name, method, url, data in targets}
+
+    def request(self, client, method, url, data):
+        if self.options['cold']:
+            cache.clear()
+        response = getattr(client, method)(url, data)
+        # Успешная форма перенаправляет; 200 на POST — ошибка формы.
+        expected = 200 if method == 'get' else 302
+        if response.status_code != expected:
+            raise CommandError(
+                f'{method.upper()} {url}: ответ {response.status_code}, '
+                f'ожидался {expected}.')
+
+    def measure(self, client, method, url, data):
+        for _ in range(self.options['warmup']):
+            self.request(client, method, url, data)
+        latencies = []
+        queries = []
+        for _ in range(self.options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                self.request(client, method, url, data)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+        # Память меряется отдельным запросом: tracemalloc
+        # замедляет код и испортил бы задержки.
+        tracemalloc.start()
+        try:
+            self.request(client, method, url, data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50': statistics.median(latencies) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'queries': statistics.median(queries),
+            'memory': peak / 1024,
+        }
+
+    def is_regression(self, metric, value, base):
+        if metric == 'queries':
+            return value > base
+        return value > base * (1 + self.options['tolerance'])
+
+    def report(self, results, baseline):
+        """Печатает таблицу и изменения к эталону; возвращает число
+        ухудшений."""
+        self.stdout.write(
+            f'{"view":<14}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"память, КБ":>12}')
+        regressions = 0
+        for name, values in results.items():
+            self.stdout.write(
+                f'{name:<14}{values["p50"]:>10.2f}{values["p95"]:>10.2f}'
+                f'{values["queries"]:>10g}{values["memory"]:>12.0f}')
+            base = (baseline or {}).get(name)
+            if base is None:
+                continue
+            changes = []
+            for metric in METRICS:
+                change = values[metric] - base[metric]
+                mark = ''
+                if self.is_regression(metric, values[metric], base[metric]):
+                    mark = ' !'
+                    regressions += 1
+                share = change / base[metric] if base[metric] else 0
+                changes.append(f'{metric} {share:+.0%}{mark}')
+            self.stdout.write(f'{"":<14}{", ".join(changes)}')
+        return regressions
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты и комментарии пользователя в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию — stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        chunks = export(user, options['format'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as output:
+            output.writelines(chunks)
+        self.stderr.write(f'Выгрузка записана в {options["output"]}.')
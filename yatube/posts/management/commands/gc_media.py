@@ -0,0 +1,188 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.models import StoredFile
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, на которые никто не ссылается, '
+            'и их миниатюры, а также миниатюры без записи в sorl.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов или записей проверять за один запрос.')
+        parser.add_argument(
+            '--rate', type=float, default=50,
+            help='Не больше стольких удалений в секунду; 0 — без предела.')
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их пост '
+                 'может быть ещё не сохранён.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.rate = options['rate']
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.deadline = time.time() - options['min_age']
+        self.storage = Post._meta.get_field('image').storage
+        self.upload_to = Post._meta.get_field('image').upload_to
+        self.next_delete = time.monotonic()
+        self.checked = self.deleted = self.freed = 0
+        self.collect_stale_thumbnails()
+        self.collect_originals()
+        self.collect_untracked_thumbnails()
+        verb = 'Можно удалить' if self.dry_run else 'Удалено'
+        self.stdout.write(
+            f'Проверено: {self.checked}. {verb} файлов: {self.deleted} '
+            f'({self.freed / 1024 / 1024:.1f} МБ).')
+
+    def throttle(self):
+        if not self.rate:
+            return
+        self.next_delete = max(self.next_delete, time.monotonic())
+        self.next_delete += 1 / self.rate
+        time.sleep(max(self.next_delete - time.monotonic(), 0))
+
+    def delete_file(self, storage, name):
+        try:
+            size = storage.size(name)
+        except OSError:
+            size = 0
+        if self.verbosity > 1:
+            self.stdout.write(name)
+        self.deleted += 1
+        self.freed += size
+        if not self.dry_run:
+            self.throttle()
+            storage.delete(name)
+
+    def is_recent(self, storage, name):
+        try:
+            return os.path.getmtime(storage.path(name)) > self.deadline
+        except OSError:
+            return False
+
+    def referenced(self, names):
+        return set(Post.objects.filter(image__in=names)
+                   .values_list('image', flat=True))
+
+    def walk(self, storage, directory):
+        """Старые файлы каталога пачками по batch_size имён."""
+        root = storage.path(directory)
+        batch = []
+        for path, _, files in os.walk(root):
+            for filename in files:
+                full_path = os.path.join(path, filename)
+                try:
+                    if os.path.getmtime(full_path) > self.deadline:
+                        continue
+                except OSError:
+                    continue
+                batch.append(os.path.relpath(full_path, storage.location)
+                             .replace(os.sep, '/'))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def delete_thumbnails(self, source_key):
+        """Удаляет миниатюры исходника и его записи в sorl."""
+        kvstore = default.kvstore
+        for key in kvstore._get(source_key, identity='thumbnails') or []:
+            thumbnail = kvstore._get(key)
+            if thumbnail:
+                self.delete_file(thumbnail.storage, thumbnail.name)
+            if not self.dry_run:
+                kvstore._delete(key)
+        if not self.dry_run:
+            kvstore._delete(source_key, identity='thumbnails')
+            kvstore._delete(source_key)
+
+    def collect_stale_thumbnails(self):
+        """Миниатюры исходников, которых нет ни у одного поста."""
+        prefix = add_prefix('', identity='thumbnails')
+        keys = (KVStoreModel.objects.filter(key__startswith=prefix)
+                .order_by('key').values_list('key', flat=True))
+        last_key = ''
+        while True:
+            batch = list(keys.filter(key__gt=last_key)[:self.batch_size])
+            if not batch:
+                break
+            last_key = batch[-1]
+            sources = {}
+            for key in batch:
+                source = default.kvstore._get(del_prefix(key))
+                if source is not None:
+                    sources[source.name] = del_prefix(key)
+            self.checked += len(batch)
+            referenced = self.referenced(list(sources))
+            for name, source_key in sources.items():
+                if not (name in referenced
+                        or self.is_recent(self.storage, name)):
+                    self.delete_thumbnails(source_key)
+
+    def forget(self, name, references):
+        """Удаляет запись StoredFile, если ссылок с проверки не прибавилось.
+
+        Новая загрузка того же содержимого добавляет ссылку до того,
+        как её пост сохранён; такой файл удалять нельзя.
+        """
+        if self.dry_run:
+            return True
+        stored = StoredFile.objects.filter(name=name)
+        if references is None:
+            return not stored.exists()
+        deleted, _ = stored.filter(references=references).delete()
+        return bool(deleted)
+
+    def collect_originals(self):
+        """Картинки в каталоге постов, на которые не ссылается ни один пост."""
+        for batch in self.walk(self.storage, self.upload_to):
+            self.checked += len(batch)
+            orphans = set(batch) - self.referenced(batch)
+            references = dict(StoredFile.objects.filter(name__in=orphans)
+                              .values_list('name', 'references'))
+            for name in sorted(orphans):
+                # Файл могли загрузить заново уже после обхода каталога.
+                if (self.is_recent(self.storage, name)
+                        or not self.forget(name, references.get(name))):
+                    continue
+                source = default.kvstore.get(ImageFile(name, self.storage))
+                if source is not None:
+                    self.delete_thumbnails(source.key)
+                self.delete_file(self.storage, name)
+
+    def collect_untracked_thumbnails(self):
+        """Файлы миниатюр, о которых не знает хранилище ключей sorl."""
+        thumbnail_storage = default.storage
+        directory = sorl_settings.THUMBNAIL_PREFIX
+        values = (KVStoreModel.objects
+                  .filter(key__startswith=add_prefix('', identity='image'))
+                  .values_list('value', flat=True))
+        # Имена известных миниатюр — единственное, что держится
+        # в памяти целиком; файлы проверяются пачками.
+        known = set()
+        for value in values.iterator():
+            name = deserialize(value)['name']
+            if name.startswith(directory):
+                known.add(name)
+        for batch in self.walk(thumbnail_storage, directory):
+            self.checked += len(batch)
+            for name in batch:
+                if name not in known:
+                    self.delete_file(thumbnail_storage, name)
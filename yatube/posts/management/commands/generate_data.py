@@ -0,0 +1,249 @@
+import random
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import feed_cache, search
+from posts.models import (
+    AuthorStats, Comment, FeedEntry, Follow, Group, Post, User)
+
+
+def power_law(rng, n, alpha):
+    """Номер из [0, n) с вероятностью, убывающей как (k + 1) ** -alpha.
+
+    Обратная функция распределения вместо таблицы весов: память
+    не зависит от n.
+    """
+    u = rng.random()
+    if alpha == 1:
+        x = (n + 1) ** u
+    else:
+        x = (((n + 1) ** (1 - alpha) - 1) * u + 1) ** (1 / (1 - alpha))
+    return min(int(x) - 1, n - 1)
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даёт записать свои даты в поля с auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу правдоподобными данными для проверки '
+            'производительности: пользователи, группы, посты, '
+            'комментарии и подписки со степенным распределением.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона активности и популярности.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить публикации.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        # Тексты собираются из заранее созданных предложений:
+        # Faker на каждый пост был бы самой медленной частью.
+        self.sentences = [self.fake.sentence() for _ in range(2000)]
+        started = time.monotonic()
+        self.user_ids = self.step(
+            'Пользователей', self.create_users, options['users'],
+            options['password'])
+        if not self.user_ids:
+            self.user_ids = list(User.objects.values_list('pk', flat=True))
+        self.group_ids = self.step(
+            'Групп', self.create_groups, options['groups'])
+        first_post = next_pk(Post)
+        self.post_dates = []
+        self.step('Постов', self.create_posts, options['posts'])
+        self.step('Комментариев', self.create_comments, options['comments'])
+        first_follow = next_pk(Follow)
+        self.step('Подписок', self.create_follows, options['follows'])
+        # Счётчики нужны раньше лент: по ним авторы делятся
+        # на рассылаемых и читаемых по запросу.
+        call_command('reconcile_stats', stdout=self.stdout)
+        AuthorStats.objects.filter(
+            followers_count__gt=settings.FEED_PUSH_FOLLOWER_LIMIT,
+        ).update(pull_feed=True)
+        self.fill_feeds(first_follow, first_post)
+        feed_cache.bump_generation(
+            feed_cache.FEED, feed_cache.GROUPS, feed_cache.NAMES)
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с.')
+
+    def step(self, title, create, count, *args):
+        started = time.monotonic()
+        ids = create(count, *args) if count else range(0)
+        self.stdout.write(
+            f'{title}: {len(ids)} за {time.monotonic() - started:.1f} с.')
+        return ids
+
+    def batches(self, count):
+        for start in range(0, count, self.batch_size):
+            yield range(start, min(start + self.batch_size, count))
+
+    def date(self, position, count):
+        """Даты растут вместе с id, как у настоящих записей."""
+        offset = self.span * (1 - (position + self.rng.random()) / count)
+        return self.now - offset
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(low, high)))
+
+    def pick(self, ids):
+        """Элемент ids: первые выбираются намного чаще последних."""
+        return ids[power_law(self.rng, len(ids), self.alpha)]
+
+    def create_users(self, count, password):
+        first = next_pk(User)
+        password = make_password(password)
+        for batch in self.batches(count):
+            User.objects.bulk_create([
+                User(pk=first + number,
+                     username=f'{self.fake.user_name()}{first + number}',
+                     first_name=self.fake.first_name(),
+                     last_name=self.fake.last_name(),
+                     email=self.fake.email(),
+                     password=password)
+                for number in batch])
+        ids = list(range(first, first + count))
+        # Порядок популярности не должен совпадать с порядком id.
+        self.rng.shuffle(ids)
+        return ids
+
+    def create_groups(self, count):
+        first = next_pk(Group)
+        Group.objects.bulk_create([
+            Group(pk=first + number,
+                  title=self.fake.catch_phrase()[:200],
+                  slug=f'{self.fake.slug()}-{first + number}'[:50],
+                  description=self.text(1, 3))
+            for number in range(count)])
+        return list(range(first, first + count))
+
+    def create_posts(self, count):
+        if not self.user_ids:
+            return range(0)
+        first = next_pk(Post)
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            for batch in self.batches(count):
+                posts = [
+                    Post(pk=first + number,
+                         author_id=self.pick(self.user_ids),
+                         group_id=(self.pick(self.group_ids)
+                                   if self.group_ids
+                                   and self.rng.random() < 0.5 else None),
+                         text=self.text(1, 8),
+                         pub_date=self.date(number, count))
+                    for number in batch]
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                    search.index_posts(posts)
+                self.post_dates.extend(post.pub_date for post in posts)
+        self.first_post = first
+        return range(first, first + count)
+
+    def comment(self, number, count):
+        """Комментарий к посту, опубликованному до даты комментария.
+
+        Чем новее пост на эту дату, тем чаще его обсуждают.
+        """
+        created = self.date(number, count)
+        published = bisect_right(self.post_dates, created)
+        index = max(published - 1 - power_law(
+            self.rng, max(published, 1), self.alpha), 0)
+        return Comment(
+            post_id=self.first_post + index,
+            author_id=self.rng.choice(self.user_ids),
+            text=self.text(1, 3),
+            created=max(created, self.post_dates[index]))
+
+    def create_comments(self, count):
+        if not (self.post_dates and self.user_ids):
+            return range(0)
+        created = Comment._meta.get_field('created')
+        with explicit_dates(created):
+            for batch in self.batches(count):
+                Comment.objects.bulk_create(
+                    [self.comment(number, count) for number in batch])
+        return range(count)
+
+    def create_follows(self, count):
+        first = next_pk(Follow)
+        if len(self.user_ids) < 2:
+            return range(0)
+        for batch in self.batches(count):
+            follows = []
+            for _ in batch:
+                user_id = self.rng.choice(self.user_ids)
+                author_id = self.pick(self.user_ids)
+                if user_id != author_id:
+                    follows.append(
+                        Follow(user_id=user_id, author_id=author_id))
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return range(Follow.objects.filter(pk__gte=first).count())
+
+    def fill_feeds(self, first_follow, first_post):
+        """Раскладывает посты по лентам, как feed.backfill_follow.
+
+        Новые подписки получают все посты автора, старые — новые посты.
+        INSERT ... SELECT вместо цикла по подпискам: строк лент
+        на порядки больше, чем подписок.
+        """
+        started = time.monotonic()
+        entries = 0
+        with connection.cursor() as cursor:
+            for condition, first in (('f.id >= %s', first_follow),
+                                     ('p.id >= %s', first_post)):
+                cursor.execute(
+                    f'INSERT INTO {FeedEntry._meta.db_table} '
+                    '(user_id, post_id, pub_date) '
+                    'SELECT f.user_id, p.id, p.pub_date '
+                    f'FROM {Follow._meta.db_table} f '
+                    f'JOIN {Post._meta.db_table} p '
+                    'ON p.author_id = f.author_id '
+                    f'WHERE {condition} AND f.author_id NOT IN ('
+                    f' SELECT user_id FROM {AuthorStats._meta.db_table}'
+                    ' WHERE pull_feed) '
+                    'ON CONFLICT DO NOTHING',
+                    [first])
+                entries += cursor.rowcount
+        self.stdout.write(
+            f'Записей лент: {entries} за {time.monotonic() - started:.1f} с.')
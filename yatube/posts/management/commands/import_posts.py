@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import READERS, PostImporter
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты из файла JSONL или CSV с полями '
+            'author, group, text и image.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами; - — стандартный ввод.')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла; по умолчанию — по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов проверять и вставлять за транзакцию.')
+        parser.add_argument(
+            '--image-root',
+            help='Каталог, от которого отсчитываются пути картинок.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rpartition('.')[2].lower()
+        if file_format not in READERS:
+            raise CommandError('Укажите --format: jsonl или csv.')
+        importer = PostImporter(
+            image_root=options['image_root'],
+            batch_size=options['batch_size'])
+        if path == '-':
+            importer.run(READERS[file_format](sys.stdin))
+        else:
+            with open(path, newline='', encoding='utf-8') as lines:
+                importer.run(READERS[file_format](lines))
+        for number, message in importer.errors:
+            self.stderr.write(f'Строка {number}: {message}')
+        self.stdout.write(
+            f'Импортировано постов: {importer.created}. '
+            f'Ошибок: {importer.failed}.')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов заново.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк PostTerm вставлять за раз.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.rebuild(options['batch_size'])
+        backend = 'FTS5' if search.use_fts() else 'PostTerm'
+        self.stdout.write(f'Проиндексировано постов: {total} ({backend}).')
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, User
+from posts.stats import COUNTERS
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики авторов и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей проверять за один проход.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        fixed = checked = 0
+        last_pk = 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+            fixed += self.reconcile(batch, dry_run)
+        verb = 'Найдено' if dry_run else 'Исправлено'
+        self.stdout.write(
+            f'Проверено пользователей: {checked}. '
+            f'{verb} расхождений: {fixed}.')
+
+    def reconcile(self, user_ids, dry_run):
+        actual = {
+            user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+        for field, (model, lookup) in COUNTERS.items():
+            # Без order_by() поля сортировки модели попали бы в GROUP BY.
+            rows = (model.objects.filter(**{f'{lookup}__in': user_ids})
+                    .order_by().values(lookup).annotate(total=Count('pk'))
+                    .values_list(lookup, 'total'))
+            for user_id, total in rows:
+                actual[user_id][field] = total
+        stored = AuthorStats.objects.in_bulk(user_ids)
+        changed = []
+        for user_id, counters in actual.items():
+            stats = stored.get(user_id) or AuthorStats(user_id=user_id)
+            if user_id in stored and all(
+                    getattr(stats, field) == value
+                    for field, value in counters.items()):
+                continue
+            for field, value in counters.items():
+                setattr(stats, field, value)
+            changed.append(stats)
+        if changed and not dry_run:
+            with transaction.atomic():
+                for stats in changed:
+                    stats.save()
+        return len(changed)
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feed(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    for follow in Follow.objects.all().iterator():
+        posts = Post.objects.filter(
+            author_id=follow.author_id).values_list('pk', 'pub_date')
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts],
+            batch_size=500,
+            ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_auto_20220713_1054'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    stats = []
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        stats.append(AuthorStats(
+            user_id=user_id,
+            posts_count=Post.objects.filter(author_id=user_id).count(),
+            comments_count=Comment.objects.filter(author_id=user_id).count(),
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count()))
+    AuthorStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:57
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    keep = (Follow.objects.values('user_id', 'author_id')
+            .annotate(first_id=Min('id')).values_list('first_id', flat=True))
+    duplicates = Follow.objects.exclude(id__in=list(keep))
+    pairs = set(duplicates.values_list('user_id', 'author_id'))
+    if not pairs:
+        return
+    duplicates.delete()
+    # 0013 посчитала дубликаты в счётчиках подписок: пересчитываем их.
+    for user_id in {user_id for user_id, _ in pairs}:
+        AuthorStats.objects.filter(user_id=user_id).update(
+            following_count=Follow.objects.filter(user_id=user_id).count())
+    for author_id in {author_id for _, author_id in pairs}:
+        AuthorStats.objects.filter(user_id=author_id).update(
+            followers_count=Follow.objects.filter(
+                author_id=author_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_authorstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-pub_date', '-id'], 'verbose_name': 'Пост', 'verbose_name_plural': 'Посты'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+from collections import Counter
+
+# Копии posts.search на момент миграции: дальнейшие правки модуля
+# не должны менять то, что делает уже выпущенная миграция.
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in TOKEN_RE.findall(text.lower())]
+
+
+def use_fts(db):
+    if getattr(settings, 'SEARCH_BACKEND', 'auto') == 'terms':
+        return False
+    if db.vendor != 'sqlite':
+        return False
+    with db.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def fill_index(apps, schema_editor):
+    db = schema_editor.connection
+    if use_fts(db):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(text, tokenize="unicode61 remove_diacritics 2")')
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post')
+        return
+    Post = apps.get_model('posts', 'Post')
+    PostTerm = apps.get_model('posts', 'PostTerm')
+    rows = []
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        rows.extend(
+            PostTerm(post_id=pk, term=term, count=count)
+            for term, count in Counter(tokenize(text)).items())
+    PostTerm.objects.bulk_create(rows, batch_size=500)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('count', models.PositiveIntegerField(verbose_name='Вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поста',
+                'verbose_name_plural': 'Слова постов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_post_term'),
+        ),
+        migrations.RunPython(fill_index, drop_fts_table),
+    ]
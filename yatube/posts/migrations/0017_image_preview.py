@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:26
+
+import base64
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import migrations, models
+from PIL import Image, ImageOps
+
+# Копии core.images.preview и POST_IMAGE_PLACEHOLDER_SIZE на момент
+# миграции: их дальнейшие правки не должны её менять.
+PLACEHOLDER_SIZE = (16, 6)
+ROTATED = (5, 6, 7, 8)
+
+
+def preview(f, size):
+    f.seek(0)
+    with Image.open(f) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in ROTATED:
+            width, height = height, width
+        image.draft('RGB', (size[0] * 4, size[1] * 4))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', optimize=True)
+    f.seek(0)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return (width, height), f'data:image/png;base64,{data}'
+
+
+def fill_previews(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.exclude(image='').iterator():
+        try:
+            (post.image_width, post.image_height), post.image_placeholder = (
+                preview(post.image, PLACEHOLDER_SIZE))
+        except (OSError, SuspiciousFileOperation):
+            continue
+        finally:
+            post.image.close()
+        post.save(update_fields=[
+            'image_width', 'image_height', 'image_placeholder'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.CharField(blank=True, editable=False, max_length=1024, verbose_name='Заглушка картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:51
+
+from django.db import migrations, models
+
+# Значение FEED_PUSH_FOLLOWER_LIMIT на момент миграции.
+PUSH_FOLLOWER_LIMIT = 1000
+
+
+def mark_pull_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gt=PUSH_FOLLOWER_LIMIT).update(pull_feed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pull_feed',
+            field=models.BooleanField(default=False, help_text='Посты не рассылаются, а читаются при открытии ленты', verbose_name='Лента по запросу'),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
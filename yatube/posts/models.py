@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -30,13 +32,31 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Прикрепите картинку')
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_placeholder = models.CharField(
+        'Заглушка картинки', max_length=1024, blank=True, editable=False)
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
 
 class Group(models.Model):
@@ -65,6 +85,14 @@ class Comment(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True)
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -81,3 +109,97 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user.
+
+    Ленту заполняет рассылка при публикации (posts.feed), поэтому
+    follow_index читает готовые отсортированные строки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель')
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, которые обновляются при записи.
+
+    Страницы читают их вместо COUNT(*) по постам, комментариям
+    и подпискам; расхождения исправляет команда reconcile_stats.
+    pull_feed — режим ленты автора, его переключает posts.feed.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев', default=0)
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок', default=0)
+    pull_feed = models.BooleanField(
+        verbose_name='Лента по запросу',
+        default=False,
+        help_text='Посты не рассылаются, а читаются при открытии ленты')
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class PostTerm(models.Model):
+    """Слово текста поста: обратный индекс для поиска.
+
+    Используется, когда в SQLite нет FTS5 или поиск переключён
+    настройкой SEARCH_BACKEND (см. posts.search).
+    """
+    term = models.CharField(
+        verbose_name='Слово',
+        max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='terms',
+        verbose_name='Пост')
+    count = models.PositiveIntegerField(
+        verbose_name='Вхождений')
+
+    class Meta:
+        verbose_name = 'Слово поста'
+        verbose_name_plural = 'Слова постов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_post_term'),
+        ]
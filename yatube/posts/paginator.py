@@ -1,10 +1,163 @@
+import base64
+import binascii
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+AFTER = 'o'
+BEFORE = 'n'
+
+
+def encode_cursor(obj, direction, key='pub_date'):
+    """Кодирует позицию объекта (key, id) в строку для URL."""
+    raw = f'{direction}|{getattr(obj, key).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для испорченного значения возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (AFTER, BEFORE) or value is None:
+        return None
+    return direction, value, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Не знает своего номера (number — None) и общего числа страниц,
+    зато умеет отдавать курсоры на соседние страницы.
+    """
+    def __init__(self, object_list, paginator, has_before, has_after):
+        super().__init__(object_list, None, paginator)
+        self._has_before = has_before
+        self._has_after = has_after
+
+    def __repr__(self):
+        # Page.__repr__ считал бы страницы через COUNT(*).
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self._has_after
+
+    def has_previous(self):
+        return self._has_before
+
+    def next_cursor(self):
+        if not (self._has_after and self.object_list):
+            return None
+        return encode_cursor(
+            self.object_list[-1], AFTER, self.paginator.key)
+
+    def previous_cursor(self):
+        if not (self._has_before and self.object_list):
+            return None
+        return encode_cursor(
+            self.object_list[0], BEFORE, self.paginator.key)
 
 
-def post_paginator(request, post_list):
-    """Пагинация постов."""
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (key, id).
+
+    Каждая страница выбирается поиском по индексу с LIMIT,
+    без COUNT(*) и OFFSET, поэтому глубокие страницы стоят
+    столько же, сколько первая. По умолчанию ленты идут
+    от новых постов к старым.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, key='pub_date',
+                 descending=True, lookups=None):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self.descending = descending
+        # Выражения ключа и id для WHERE и ORDER BY; их значения
+        # должны совпадать с атрибутами key и pk объектов.
+        self.key_lookup, self.pk_lookup = lookups or (key, 'pk')
+        self.object_list = object_list.order_by(*self._ordering(descending))
+
+    def _ordering(self, descending):
+        sign = '-' if descending else ''
+        return sign + self.key_lookup, sign + self.pk_lookup
+
+    @property
+    def page_range(self):
+        return range(0)
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._after(None)
+        direction, value, pk = position
+        if direction == BEFORE:
+            return self._before(value, pk)
+        return self._after((value, pk))
+
+    def _beyond(self, value, pk, forward):
+        """Условие «дальше позиции (value, pk)» в порядке пагинатора."""
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return (Q(**{f'{self.key_lookup}__{lookup}': value})
+                | Q(**{self.key_lookup: value,
+                       f'{self.pk_lookup}__{lookup}': pk}))
+
+    def _after(self, position):
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(self._beyond(*position, forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_after = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self,
+                          has_before=position is not None,
+                          has_after=has_after)
+
+    def _before(self, value, pk):
+        queryset = self.object_list.filter(
+            self._beyond(value, pk, forward=False)
+        ).order_by(*self._ordering(not self.descending))
+        rows = list(queryset[:self.per_page + 1])
+        has_before = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, has_before=has_before, has_after=True)
+
+
+def post_paginator(request, post_list, lookups=None, count=None):
+    """Пагинация постов.
+
+    Режим задаётся настройкой POST_PAGINATION: 'offset' нумерует
+    страницы (`?page=`), 'cursor' выбирает их по ключу (pub_date, id).
+    Запрос с параметром `?cursor=` и выборки с cursor_only (слитая
+    лента подписок) всегда обслуживаются курсором.
+    lookups — выражения ключа для курсора (см. CursorPaginator).
+    count — известное заранее число постов: номерным страницам
+    тогда не нужен COUNT(*).
+    """
+    cursor = request.GET.get(CURSOR_PARAM)
+    if (cursor is not None or settings.POST_PAGINATION == 'cursor'
+            or getattr(post_list, 'cursor_only', False)):
+        return CursorPaginator(
+            post_list, settings.LIMIT, lookups=lookups).get_page(cursor)
     paginator = Paginator(post_list, settings.LIMIT)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def comment_paginator(request, comment_list):
+    """Порция комментариев от старых к новым по курсору `?cursor=`."""
+    paginator = CursorPaginator(
+        comment_list, settings.COMMENTS_LIMIT, key='created',
+        descending=False)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
@@ -0,0 +1,253 @@
+import base64
+import binascii
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, PostTerm
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+SNIPPET_WORDS = 20
+
+_fts5 = {}
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, как их режет unicode61 в FTS5."""
+    return [word[:MAX_TERM_LENGTH] for word in TOKEN_RE.findall(text.lower())]
+
+
+def has_fts5(db):
+    """Собран ли SQLite соединения db с FTS5."""
+    if db.vendor != 'sqlite':
+        return False
+    if db.alias not in _fts5:
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5[db.alias] = any(
+                row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+    return _fts5[db.alias]
+
+
+def use_fts(db=connection):
+    return settings.SEARCH_BACKEND != 'terms' and has_fts5(db)
+
+
+def create_fts_table(db):
+    with db.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(text, tokenize="unicode61 remove_diacritics 2")')
+
+
+def _term_rows(post):
+    counts = Counter(tokenize(post.text))
+    return [PostTerm(post_id=post.pk, term=term, count=count)
+            for term, count in counts.items()]
+
+
+def index_post(post):
+    """Заменяет слова поста в индексе."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text])
+        return
+    PostTerm.objects.filter(post_id=post.pk).delete()
+    PostTerm.objects.bulk_create(_term_rows(post))
+
+
+def index_posts(posts):
+    """Добавляет в индекс пачку новых постов."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [(post.pk, post.text) for post in posts])
+        return
+    PostTerm.objects.bulk_create(
+        [row for post in posts for row in _term_rows(post)], batch_size=500)
+
+
+def unindex_post(post_id):
+    """Убирает пост из индекса. Строки PostTerm удаляет каскад."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(batch_size=500):
+    """Строит индекс заново по всем постам; возвращает их число."""
+    posts = Post.objects.order_by().only('pk', 'text')
+    total = 0
+    if use_fts():
+        create_fts_table(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}')
+            total = cursor.rowcount
+        return total
+    PostTerm.objects.all().delete()
+    rows = []
+    for post in posts.iterator():
+        rows.extend(_term_rows(post))
+        total += 1
+        if len(rows) >= batch_size:
+            PostTerm.objects.bulk_create(rows, batch_size=batch_size)
+            rows = []
+    PostTerm.objects.bulk_create(rows, batch_size=batch_size)
+    return total
+
+
+def _match_expression(terms):
+    # Слова состоят из \w, поэтому кавычки внутри не встречаются.
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _matching_terms(terms):
+    """Посты, где есть все слова terms, с весом по числу вхождений."""
+    return (PostTerm.objects.filter(term__in=terms)
+            .values('post')
+            .annotate(matched=Count('term'), score=-Sum('count'))
+            .filter(matched=len(terms)))
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset посты, найденные по query."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset.none()
+    if use_fts():
+        return queryset.extra(
+            where=[f'{Post._meta.db_table}.id IN (SELECT rowid '
+                   f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[_match_expression(terms)])
+    return queryset.filter(
+        pk__in=_matching_terms(terms).values('post'))
+
+
+def encode_cursor(score, pk):
+    raw = f'{score!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        score, pk = raw.split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _fts_ranked(terms, position, limit):
+    sql = (f'SELECT score, id FROM (SELECT rank AS score, rowid AS id '
+           f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)')
+    params = [_match_expression(terms)]
+    if position is not None:
+        sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+        params += [position[0], position[0], position[1]]
+    sql += ' ORDER BY score, id LIMIT %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+def _terms_ranked(terms, position, limit):
+    ranked = _matching_terms(terms)
+    if position is not None:
+        score, pk = position
+        ranked = ranked.filter(
+            Q(score__gt=score) | Q(score=score, post__gt=pk))
+    return list(ranked.order_by('score', 'post')
+                .values_list('score', 'post')[:limit])
+
+
+def snippet(text, terms, words=SNIPPET_WORDS):
+    """Отрывок текста вокруг первого найденного слова с подсветкой."""
+    tokens = list(TOKEN_RE.finditer(text))
+    if not tokens:
+        return escape(text)
+    hits = [index for index, token in enumerate(tokens)
+            if token.group().lower()[:MAX_TERM_LENGTH] in terms]
+    start = max(hits[0] - words // 4, 0) if hits else 0
+    end = min(start + words, len(tokens))
+    parts = ['…'] if start else []
+    position = tokens[start].start()
+    for index in range(start, end):
+        token = tokens[index]
+        parts.append(escape(text[position:token.start()]))
+        if index in hits:
+            parts.append(f'<mark>{escape(token.group())}</mark>')
+        else:
+            parts.append(escape(token.group()))
+        position = token.end()
+    if end < len(tokens):
+        parts.append('…')
+    else:
+        parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
+
+
+class SearchPage:
+    """Страница результатов поиска: посты по убыванию релевантности.
+
+    Листается курсором (оценка, id), как ленты — CursorPaginator.
+    """
+    def __init__(self, object_list, next_cursor=None, has_previous=False):
+        self.object_list = object_list
+        self._next_cursor = next_cursor
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._next_cursor is not None
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_cursor(self):
+        return self._next_cursor
+
+
+def search_posts(query, cursor=None, limit=None):
+    """Посты со всеми словами query; у каждого есть snippet."""
+    limit = limit or settings.LIMIT
+    terms = list(dict.fromkeys(tokenize(query)))
+    position = decode_cursor(cursor) if cursor else None
+    if not terms:
+        return SearchPage([])
+    ranked = _fts_ranked if use_fts() else _terms_ranked
+    rows = ranked(terms, position, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1])
+    found = (Post.objects.select_related('author', 'group')
+             .in_bulk([pk for _, pk in rows]))
+    posts = []
+    for _, pk in rows:
+        post = found.get(pk)
+        if post is not None:
+            post.snippet = snippet(post.text, set(terms))
+            posts.append(post)
+    return SearchPage(posts, next_cursor, has_previous=position is not None)
@@ -0,0 +1,171 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import thumbnails
+from core.images import preview
+from . import autocomplete, feed, feed_cache, search, stats
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # Пост могли перенести в другую группу: старую тоже нужно сбросить.
+    # Текст и картинка нужны, чтобы не переиндексировать пост
+    # и не пересоздавать миниатюры без их изменения.
+    old = None
+    if instance.pk is not None:
+        old = (Post.objects.filter(pk=instance.pk)
+               .values_list('group_id', 'text', 'image').first())
+    (instance._old_group_id, instance._old_text,
+     instance._old_image) = old or (None, None, None)
+    # Новая загрузка добавит ссылку на файл, даже если байты те же
+    # и имя не изменится; прежнюю ссылку тогда нужно освободить.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed)
+    if instance.image.name != instance._old_image:
+        describe_image(instance)
+
+
+def describe_image(post):
+    """Запоминает размеры и заглушку новой картинки поста."""
+    post.image_width = post.image_height = None
+    post.image_placeholder = ''
+    if not post.image:
+        return
+    try:
+        (post.image_width, post.image_height), post.image_placeholder = (
+            preview(post.image, settings.POST_IMAGE_PLACEHOLDER_SIZE))
+    except (OSError, SuspiciousFileOperation):
+        pass
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'posts_count', 1)
+        feed.fan_out_post(instance)
+    if instance.text != getattr(instance, '_old_text', None):
+        search.index_post(instance)
+    if instance.image and (
+            instance.image.name != getattr(instance, '_old_image', None)):
+        # Страницы поста могли закешироваться с заглушками.
+        thumbnails.enqueue(
+            instance.image.name, thumbnails.post_image_thumbnails(),
+            instance.image.storage,
+            on_ready=partial(feed_cache.bump_generation,
+                             *feed_cache.post_scopes(instance)))
+    old_image = getattr(instance, '_old_image', None)
+    if old_image and (old_image != instance.image.name
+                      or getattr(instance, '_image_uploaded', False)):
+        thumbnails.release_image(instance.image.storage, old_image)
+    scopes = feed_cache.post_scopes(instance)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id:
+        scopes.append(feed_cache.group_scope(old_group_id))
+    feed_cache.bump_generation(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'posts_count', -1)
+    search.unindex_post(instance.pk)
+    thumbnails.release_image(instance.image.storage, instance.image.name)
+    feed_cache.bump_generation(*feed_cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    feed_cache.bump_generation(
+        feed_cache.GROUPS, feed_cache.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    autocomplete.group_changed(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    autocomplete.group_deleted(instance.pk)
+
+
+# Поля пользователя, которые показываются на страницах.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def saves_names(update_fields):
+    # Вход пользователя сохраняет только last_login.
+    return update_fields is None or bool(
+        set(update_fields) & set(USER_NAME_FIELDS))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._old_names = None
+    if instance.pk is not None and saves_names(update_fields):
+        instance._old_names = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*USER_NAME_FIELDS).first())
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if not saves_names(update_fields):
+        return
+    old_names = getattr(instance, '_old_names', None)
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if names == old_names:
+        return
+    autocomplete.user_changed(instance)
+    if old_names is None:
+        return
+    # Имя автора есть в ленте, группах и профиле, а логин — ещё
+    # и в комментариях: их страницы и валидаторы нужно сбросить.
+    scopes = [feed_cache.FEED, feed_cache.GROUPS,
+              feed_cache.author_scope(instance.pk)]
+    if old_names[0] != instance.username:
+        post_ids = (Comment.objects.filter(author_id=instance.pk)
+                    .values_list('post_id', flat=True).distinct())
+        scopes.extend(feed_cache.post_scope(post_id)
+                      for post_id in post_ids)
+    feed_cache.bump_generation(*scopes)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.user_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_added(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'comments_count', 1)
+    feed_cache.bump_generation(feed_cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'comments_count', -1)
+    feed_cache.bump_generation(feed_cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'followers_count', 1)
+        stats.change(instance.user_id, 'following_count', 1)
+        feed.backfill_follow(instance)
+    feed_cache.bump_generation(feed_cache.follows_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'followers_count', -1)
+    stats.change(instance.user_id, 'following_count', -1)
+    feed.trim_follow(instance)
+    feed_cache.bump_generation(feed_cache.follows_scope(instance.user_id))
@@ -0,0 +1,51 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import AuthorStats, Comment, Follow, Post
+
+COUNTERS = {
+    'posts_count': (Post, 'author_id'),
+    'comments_count': (Comment, 'author_id'),
+    'followers_count': (Follow, 'author_id'),
+    'following_count': (Follow, 'user_id'),
+}
+
+
+def recount(user_id):
+    """Считает все счётчики пользователя по исходным таблицам."""
+    return {
+        field: model.objects.filter(**{lookup: user_id}).count()
+        for field, (model, lookup) in COUNTERS.items()
+    }
+
+
+def find_stats(user_id):
+    """Счётчики пользователя или None; запись не создаётся.
+
+    Для путей удаления: при удалении пользователя его запись уже
+    удалена каскадом, и пересчёт создал бы её заново.
+    """
+    return AuthorStats.objects.filter(user_id=user_id).first()
+
+
+def get_stats(user_id):
+    """Счётчики пользователя; отсутствующая запись создаётся пересчётом."""
+    try:
+        return AuthorStats.objects.get(user_id=user_id)
+    except AuthorStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return AuthorStats.objects.create(
+                user_id=user_id, **recount(user_id))
+    except IntegrityError:
+        return AuthorStats.objects.get(user_id=user_id)
+
+
+def change(user_id, field, delta):
+    """Сдвигает счётчик field пользователя на delta одним UPDATE."""
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        get_stats(user_id)
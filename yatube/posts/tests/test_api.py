@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {number}',
+                 group=cls.group if number % 2 else None)
+            for number in range(15))
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response
+
+    def test_feed_pages_by_cursor(self):
+        """Лента отдаётся страницами, курсоры ведут вперёд и назад."""
+        response = self.get(reverse('posts:api_index'), limit=10)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNone(data['previous'])
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [item['id'] for item in data['results'] + second['results']]
+        self.assertEqual(
+            ids, list(Post.objects.values_list('pk', flat=True)))
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], data['results'])
+
+    def test_default_fields(self):
+        """Без ?fields= отдаются основные поля поста."""
+        item = self.get(reverse('posts:api_index')).json()['results'][0]
+        post = Post.objects.first()
+        self.assertEqual(item, {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'author': 'author',
+            'group': None,
+            'image': None,
+        })
+
+    def test_sparse_fields(self):
+        """?fields= ограничивает поля ответа и запрос к БД."""
+        response = self.get(
+            reverse('posts:api_index'), fields='id,author')
+        item = response.json()['results'][0]
+        self.assertEqual(set(item), {'id', 'author'})
+        self.assertNotIn('Пост'.encode(), response.content)
+
+    def test_unknown_field_rejected(self):
+        """Неизвестное поле — ошибка 400."""
+        response = self.get(reverse('posts:api_index'), fields='id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_group_and_profile(self):
+        """Посты группы и автора берутся из тех же выборок, что и HTML."""
+        group = self.get(
+            reverse('posts:api_group_posts', args=[self.group.slug]),
+            limit=100).json()
+        self.assertEqual(len(group['results']), 7)
+        self.assertTrue(all(
+            item['group'] == self.group.slug for item in group['results']))
+        profile = self.get(
+            reverse('posts:api_profile', args=[self.reader.username]))
+        self.assertEqual(profile.json()['results'], [])
+        missing = self.client.get(
+            reverse('posts:api_profile', args=['nobody']))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_follow_requires_login(self):
+        """Лента подписок доступна только авторизованному посетителю."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        results = self.get(url, limit=100).json()['results']
+        self.assertEqual(len(results), 15)
+
+    def test_rows_are_not_model_instances(self):
+        """Страница читается одним запросом, без подгрузки связей."""
+        with self.assertNumQueries(1):
+            self.get(reverse('posts:api_index'), fields='author,group')
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.tests.test_thumbnails import run_on_commit
+from .. import autocomplete
+from ..feed_cache import NAMES, bump_generation
+from ..models import Group, User
+
+
+@override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+class AutocompleteTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        User.objects.create_user(username='Leonid')
+        User.objects.create_user(username='anna')
+        cls.group = Group.objects.create(
+            title='Левые новости',
+            slug='lenta',
+            description='Тестовое описание')
+
+    def setUp(self):
+        cache.clear()
+        connection.run_on_commit = []
+
+    def labels(self, prefix):
+        return [result['label'] for result in autocomplete.lookup(prefix)]
+
+    def test_prefix_lookup(self):
+        """Находятся пользователи и группы по началу имени и slug."""
+        self.assertEqual(self.labels('LEO'), ['leo', 'Leonid'])
+        self.assertEqual(self.labels('лев'), ['Левые новости'])
+        self.assertEqual(
+            self.labels('le'), ['Левые новости', 'leo', 'Leonid'])
+        self.assertEqual(self.labels('x'), [])
+
+    def test_lookup_does_not_query_db(self):
+        """Прогретый индекс отвечает без запросов к БД."""
+        autocomplete.lookup('a')
+        with self.assertNumQueries(0):
+            autocomplete.lookup('le')
+
+    def test_changes_update_index_in_place(self):
+        """Изменения пользователей и групп видны без перестроения."""
+        autocomplete.lookup('a')
+        self.user.username = 'max'
+        self.user.save()
+        Group.objects.create(title='Мир', slug='mir', description='Мир')
+        self.assertEqual(self.labels('ma'), [])
+        run_on_commit()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('ma'), ['max'])
+            self.assertEqual(self.labels('mi'), ['Мир'])
+            self.assertEqual(self.labels('leo'), ['Leonid'])
+        self.group.delete()
+        run_on_commit()
+        self.assertEqual(self.labels('лев'), [])
+
+    def test_change_in_other_process_replayed(self):
+        """Изменение из журнала другого процесса применяется без БД."""
+        autocomplete.lookup('a')
+        anna = User.objects.get(username='anna')
+        autocomplete._publish(
+            ('add', autocomplete.USER, anna.pk, ['anya'], ('anya', 'anya')))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('an'), ['anya'])
+
+    @override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=60)
+    def test_generation_checked_once_per_interval(self):
+        """Поколение сверяется не чаще AUTOCOMPLETE_REFRESH_INTERVAL."""
+        autocomplete._checked = None
+        autocomplete.lookup('a')
+        User.objects.filter(username='anna').update(username='anya')
+        bump_generation(NAMES)
+        self.assertEqual(self.labels('an'), ['anna'])
+
+    def test_change_in_other_process_rebuilds_index(self):
+        """Смена поколения NAMES без записи в журнале перестраивает индекс."""
+        autocomplete.lookup('a')
+        User.objects.filter(username='anna').update(username='anya')
+        bump_generation(NAMES)
+        self.assertEqual(self.labels('an'), ['anya'])
+
+    def test_autocomplete_view(self):
+        """Эндпоинт отдаёт JSON со ссылками на страницы."""
+        response = Client().get(reverse('posts:autocomplete'), {'q': 'ann'})
+        self.assertEqual(response.json(), {'results': [{
+            'type': 'user',
+            'label': 'anna',
+            'url': reverse('posts:profile', args=['anna'])}]})
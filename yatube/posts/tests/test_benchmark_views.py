@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands.benchmark_views import Command
+from ..models import Comment, Post, User
+
+VIEWS = ['index', 'group_posts', 'profile', 'post_detail',
+         'follow_index', 'post_create', 'add_comment']
+
+
+class BenchmarkViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data', users=10, groups=2, posts=30, comments=20,
+            follows=20, seed=1, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.baseline = os.path.join(self.directory, 'baseline.json')
+
+    def benchmark(self, **options):
+        out = StringIO()
+        call_command('benchmark_views', requests=2, warmup=0,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def test_report_and_baseline(self):
+        """Все страницы замеряются, эталон сохраняется, данные не меняются."""
+        posts, comments = Post.objects.count(), Comment.objects.count()
+        output = self.benchmark(save_baseline=self.baseline)
+        for view in VIEWS:
+            self.assertIn(view, output)
+        with open(self.baseline) as baseline:
+            results = json.load(baseline)
+        self.assertEqual(sorted(results), sorted(VIEWS))
+        self.assertGreater(results['index']['queries'], 0)
+        self.assertEqual(Post.objects.count(), posts)
+        self.assertEqual(Comment.objects.count(), comments)
+
+    def test_keeps_records_of_other_users(self):
+        """Записи, добавленные во время замеров не ими, не удаляются."""
+        run_all = Command.run_all
+        other = User.objects.exclude(posts__isnull=True).last()
+
+        def run_with_visitors(command, user, targets):
+            results = run_all(command, user, targets)
+            post = Post.objects.create(author=other, text='Пост посетителя')
+            Comment.objects.create(
+                post=post, author=user, text='Комментарий посетителя')
+            return results
+
+        with mock.patch.object(Command, 'run_all', run_with_visitors):
+            self.benchmark()
+        post = Post.objects.get(text='Пост посетителя')
+        self.assertTrue(post.comments.exists())
+        self.assertFalse(Post.objects.filter(text='Пост из замера').exists())
+
+    def test_regression_fails(self):
+        """Рост числа запросов к эталону — ошибка при --fail-on-regression."""
+        self.benchmark(save_baseline=self.baseline)
+        with open(self.baseline) as baseline:
+            results = json.load(baseline)
+        results['index']['queries'] = 0
+        with open(self.baseline, 'w') as baseline:
+            json.dump(results, baseline)
+        with self.assertRaises(CommandError):
+            self.benchmark(baseline=self.baseline, fail_on_regression=True)
+
+    def test_post_without_redirect_fails(self):
+        """POST, который не перенаправил (ошибка формы), — ошибка замера."""
+        targets = Command.targets
+
+        def invalid_forms(command):
+            user, found = targets(command)
+            return user, [(name, method, url, data and {'text': ''})
+                          for name, method, url, data in found]
+
+        with mock.patch.object(Command, 'targets', invalid_forms):
+            with self.assertRaisesMessage(CommandError, 'ожидался 302'):
+                self.benchmark()
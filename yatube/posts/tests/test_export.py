@@ -0,0 +1,71 @@
+import csv
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост, с запятой', group=cls.group)
+        foreign = Post.objects.create(author=other, text='Чужой пост')
+        Comment.objects.create(
+            author=cls.user, post=foreign, text='Мой комментарий')
+        Comment.objects.create(
+            author=other, post=cls.post, text='Чужой комментарий')
+        cls.url = reverse('posts:export')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_jsonl_stream(self):
+        """Выгрузка отдаётся потоком: посты, затем комментарии автора."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'Пост, с запятой'), ('comment', 'Мой комментарий')])
+        self.assertEqual(rows[0]['group'], 'test-slug')
+
+    def test_csv_stream(self):
+        """CSV начинается с заголовка и экранирует запятые."""
+        response = self.client.get(self.url, {'format': 'csv'})
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(rows[0]['text'], 'Пост, с запятой')
+        self.assertEqual(rows[1]['type'], 'comment')
+
+    def test_anonymous_redirected(self):
+        """Гость отправляется на страницу входа."""
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_format(self):
+        """Неизвестный формат — 404."""
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_command(self):
+        """Команда выгружает те же строки, что и страница."""
+        out = StringIO()
+        call_command('export_user', 'auth', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])['type'], 'comment')
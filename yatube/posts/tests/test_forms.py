@@ -13,7 +13,7 @@ from ..models import Post, Group, Comment, User
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.models import StoredFile
+from core.tests.test_thumbnails import SMALL_GIF, run_on_commit
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_gif(color):
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, 'GIF')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class GarbageCollectMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        connection.run_on_commit = []
+        self.kept = self.create_post(SMALL_GIF)
+        orphan = self.create_post(make_gif('red'))
+        run_on_commit()
+        self.orphan_name = orphan.image.name
+        # Ссылка пропадает мимо сигналов, как при сбое между
+        # удалением строки и освобождением файла.
+        Post.objects.filter(pk=orphan.pk).update(image='')
+        self.untracked = os.path.join(
+            TEMP_MEDIA_ROOT, 'cache', 'ff', 'ff', 'lost.jpg')
+        os.makedirs(os.path.dirname(self.untracked))
+        with open(self.untracked, 'wb') as lost:
+            lost.write(b'lost')
+
+    def create_post(self, content):
+        return Post.objects.create(
+            author=self.user, text='Тестовый пост',
+            image=SimpleUploadedFile('small.gif', content, 'image/gif'))
+
+    def age_files(self):
+        past = time.time() - 2 * 60 * 60
+        for path, _, names in os.walk(TEMP_MEDIA_ROOT):
+            for name in names:
+                os.utime(os.path.join(path, name), (past, past))
+
+    def media_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(path, name), TEMP_MEDIA_ROOT)
+            for path, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names)
+
+    def thumbnail_keys(self, name):
+        source = default.kvstore.get(
+            ImageFile(name, Post._meta.get_field('image').storage))
+        if source is None:
+            return []
+        return default.kvstore._get(source.key, identity='thumbnails')
+
+    def gc(self, **options):
+        out = StringIO()
+        call_command('gc_media', rate=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        """В режиме --dry-run файлы только подсчитываются."""
+        self.age_files()
+        before = self.media_files()
+        output = self.gc(dry_run=True)
+        self.assertEqual(self.media_files(), before)
+        self.assertIn('Можно удалить файлов:', output)
+
+    def test_orphan_image_and_thumbnails_deleted(self):
+        """Ничейная картинка удаляется вместе с миниатюрами и записями."""
+        self.age_files()
+        orphan_thumbnails = len(self.thumbnail_keys(self.orphan_name))
+        kept_files = len(self.thumbnail_keys(self.kept.image.name)) + 1
+        self.assertGreater(orphan_thumbnails, 0)
+        output = self.gc()
+        self.assertEqual(len(self.media_files()), kept_files)
+        self.assertIn(self.kept.image.name, self.media_files())
+        self.assertEqual(self.thumbnail_keys(self.orphan_name), [])
+        self.assertFalse(
+            StoredFile.objects.filter(name=self.orphan_name).exists())
+        self.assertFalse(os.path.exists(self.untracked))
+        self.assertIn(f'Удалено файлов: {orphan_thumbnails + 2}', output)
+
+    def test_reuploaded_image_kept(self):
+        """Ничейная картинка, загруженная заново, не удаляется."""
+        self.age_files()
+        storage = Post._meta.get_field('image').storage
+        name = storage.save(
+            'posts/again.gif', ContentFile(make_gif('red')))
+        self.assertEqual(name, self.orphan_name)
+        self.gc()
+        self.assertIn(self.orphan_name, self.media_files())
+        self.assertEqual(
+            StoredFile.objects.get(name=self.orphan_name).references, 2)
+
+    def test_recent_files_kept(self):
+        """Свежие файлы не трогаются: их пост может быть ещё не сохранён."""
+        before = self.media_files()
+        self.gc()
+        self.assertEqual(self.media_files(), before)
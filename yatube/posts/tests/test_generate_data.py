@@ -0,0 +1,81 @@
+import random
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from ..management.commands.generate_data import power_law
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+from ..stats import get_stats
+
+VOLUMES = {'users': 30, 'groups': 3, 'posts': 120, 'comments': 50,
+           'follows': 60, 'batch_size': 40}
+
+
+class GenerateDataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, seed=1, **volumes):
+        call_command('generate_data', seed=seed, stdout=StringIO(),
+                     **{**VOLUMES, **volumes})
+
+    def test_volumes(self):
+        """Создаётся заданное число записей, ленты и счётчики согласованы."""
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 50)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user,
+                                     post__author=follow.author).count(),
+            follow.author.posts.count())
+        author = Post.objects.first().author
+        self.assertEqual(
+            get_stats(author.pk).posts_count, author.posts.count())
+        dates = list(Post.objects.order_by('pk')
+                     .values_list('pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_comments_follow_their_posts(self):
+        """Комментарий написан после своего поста и не позже сейчас."""
+        self.generate()
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+        self.assertFalse(Comment.objects.filter(
+            created__gt=timezone.now()).exists())
+
+    def test_new_posts_reach_existing_follows(self):
+        """Новые посты без новых пользователей попадают в старые ленты."""
+        self.generate()
+        self.generate(seed=2, users=0, groups=0, follows=0)
+        self.assertEqual(Post.objects.count(), 240)
+        for follow in Follow.objects.all():
+            self.assertEqual(
+                FeedEntry.objects.filter(
+                    user=follow.user, post__author=follow.author).count(),
+                follow.author.posts.count())
+
+    def test_same_seed_same_data(self):
+        """Один и тот же seed даёт одни и те же тексты."""
+        self.generate(seed=5)
+        first = list(Post.objects.order_by('pk')
+                     .values_list('text', flat=True))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.generate(seed=5)
+        second = list(Post.objects.order_by('pk')
+                      .values_list('text', flat=True))
+        self.assertEqual(first, second)
+
+    def test_power_law(self):
+        """Первые номера выпадают намного чаще последних."""
+        rng = random.Random(0)
+        picks = [power_law(rng, 100, 1.1) for _ in range(10000)]
+        self.assertTrue(all(0 <= pick < 100 for pick in picks))
+        self.assertGreater(picks.count(0), 10 * picks.count(99))
@@ -0,0 +1,190 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import StoredFile
+from core.tests.test_thumbnails import SMALL_GIF, run_on_commit
+from ..importer import PostImporter
+from ..models import FeedEntry, Follow, Group, Post, User
+from ..search import search_posts
+from ..stats import get_stats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(path, mode) as file_:
+            file_.write(content)
+        return path
+
+    def import_file(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import(self):
+        """Посты загружаются пачками, плохие строки пропускаются."""
+        rows = [
+            {'author': 'author', 'group': 'test-slug', 'text': 'Первый'},
+            {'author': 'author', 'text': 'Второй редкослово'},
+            {'author': 'nobody', 'text': 'Чужой'},
+            {'author': 'author', 'text': ' '},
+            {'author': 'author', 'group': 'missing', 'text': 'Без группы'},
+            {'author': 'reader', 'text': 'Третий'},
+        ]
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines.insert(2, '{сломано')
+        path = self.write('posts.jsonl', '\n'.join(lines))
+        out, err = self.import_file(path, batch_size=2)
+        self.assertIn('Импортировано постов: 3. Ошибок: 4.', out)
+        self.assertIn('Строка 4: Нет автора', err)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Первый', 'Второй редкослово', 'Третий'])
+        self.assertEqual(
+            Post.objects.get(text='Первый').group, self.group)
+        self.assertEqual(get_stats(self.author.pk).posts_count, 2)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 2)
+        found = search_posts('редкослово')
+        self.assertEqual(
+            [post.text for post in found], ['Второй редкослово'])
+
+    def test_csv_import_with_image(self):
+        """Картинка из --image-root сохраняется, как при загрузке формой."""
+        self.write('small.gif', SMALL_GIF)
+        path = self.write(
+            'posts.csv',
+            'author,group,text,image\n'
+            'author,,С картинкой,small.gif\n'
+            'author,,Мимо каталога,../etc/passwd\n')
+        out, err = self.import_file(path, image_root=self.directory)
+        self.assertIn('Импортировано постов: 1. Ошибок: 1.', out)
+        self.assertIn('Строка 3: Картинка', err)
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+
+    def image_rows(self):
+        self.write('small.gif', SMALL_GIF)
+        return [(1, {'author': 'author', 'text': 'Т', 'image': 'small.gif'})]
+
+    def test_images_stored_before_transaction(self):
+        """Картинки сохраняются до транзакции со вставкой постов."""
+        depths = {}
+        attach_image, insert = PostImporter.attach_image, PostImporter.insert
+
+        def attach_outside(importer, post, path):
+            depths['image'] = len(connection.savepoint_ids)
+            attach_image(importer, post, path)
+
+        def insert_inside(importer, posts):
+            depths['insert'] = len(connection.savepoint_ids)
+            insert(importer, posts)
+
+        with mock.patch.object(PostImporter, 'attach_image', attach_outside), \
+                mock.patch.object(PostImporter, 'insert', insert_inside):
+            PostImporter(image_root=self.directory).run(self.image_rows())
+        self.assertLess(depths['image'], depths['insert'])
+        self.assertTrue(Post.objects.get().image)
+
+    def test_failed_batch_releases_images(self):
+        """Картинки несохранённой пачки отпускаются."""
+        importer = PostImporter(image_root=self.directory)
+        with mock.patch.object(
+                PostImporter, 'insert', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                importer.run(self.image_rows())
+        run_on_commit()
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+    def test_images_need_root(self):
+        """Без --image-root пути картинок не принимаются."""
+        path = self.write(
+            'posts.jsonl',
+            json.dumps({'author': 'author', 'text': 'Т', 'image': 'a.gif'}))
+        out, _ = self.import_file(path)
+        self.assertIn('Импортировано постов: 0. Ошибок: 1.', out)
+
+
+class ImportEndpointTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.url = reverse('posts:api_import_posts')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def post(self, body, content_type='application/x-ndjson'):
+        return self.client.post(self.url, body, content_type=content_type)
+
+    def test_anonymous_rejected(self):
+        """Без авторизации загрузка запрещена."""
+        self.assertEqual(self.post('').status_code, 401)
+
+    def test_batch_import(self):
+        """Посетитель загружает только свои посты."""
+        self.client.force_login(self.author)
+        body = '\n'.join([
+            json.dumps({'text': 'Первый'}),
+            json.dumps({'author': 'author', 'text': 'Второй'}),
+            json.dumps({'author': 'other', 'text': 'Чужой'}),
+        ])
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'created': 2, 'failed': 1,
+            'errors': [{'line': 3,
+                        'error': 'Можно загружать только свои посты.'}]})
+        self.assertEqual(self.author.posts.count(), 2)
+
+    def test_csv_body(self):
+        """Тело в CSV разбирается по заголовку."""
+        self.client.force_login(self.author)
+        response = self.post('text\nИз CSV\n', content_type='text/csv')
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_unknown_content_type(self):
+        """Тело в неизвестном формате отклоняется."""
+        self.client.force_login(self.author)
+        response = self.post('{}', content_type='application/json')
+        self.assertEqual(response.status_code, 415)
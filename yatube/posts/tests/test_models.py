@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
 
-from ..models import Post, Group, User
+from ..models import AuthorStats, Comment, Follow, Post, Group, User
 
 
 class PostModelTest(TestCase):
@@ -53,3 +57,52 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+class AuthorStatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями, подписками."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.reader).comments_count, 1)
+        self.assertEqual(self.get_stats(self.reader).following_count, 1)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.get_stats(self.author).posts_count, 0)
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+        self.assertEqual(self.get_stats(self.reader).comments_count, 0)
+        self.assertEqual(self.get_stats(self.reader).following_count, 0)
+
+    def test_reconcile_stats_repairs_drift(self):
+        """reconcile_stats исправляет разошедшиеся счётчики."""
+        Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('Исправлено расхождений: 2', out.getvalue())
+        self.assertEqual(self.get_stats(self.author).posts_count, 2)
+        self.assertEqual(self.get_stats(self.reader).posts_count, 0)
+
+    def test_user_with_followers_can_be_deleted(self):
+        """Удаление автора с подписчиками не пересоздаёт его счётчики."""
+        author = User.objects.create_user(username='leaving')
+        Post.objects.create(author=author, text='Пост')
+        Follow.objects.create(user=self.reader, author=author)
+        with transaction.atomic():
+            author.delete()
+        self.assertFalse(
+            AuthorStats.objects.filter(user_id=author.pk).exists())
@@ -0,0 +1,118 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        for i in range(15):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_plans(self, url, table):
+        """Планы всех запросов страницы, которые читают table."""
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                reads_table = f'FROM "{table}"' in sql
+                if not sql.startswith('SELECT') or not reads_table:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append(
+                    '\n'.join(str(row[-1]) for row in cursor.fetchall()))
+        self.assertTrue(plans, f'Страница {url} не читает {table}')
+        return plans
+
+    def assertPlanUses(self, url, table, index):
+        plans = self.get_plans(url, table)
+        self.assertTrue(
+            any(index in plan and 'TEMP B-TREE' not in plan
+                for plan in plans),
+            f'{url}: индекс {index} не используется:\n' + '\n\n'.join(plans))
+
+    def test_index_uses_pub_date_index(self):
+        self.assertPlanUses(
+            reverse('posts:index'), 'posts_post', 'post_pub_date_idx')
+
+    def test_group_uses_group_pub_date_index(self):
+        self.assertPlanUses(
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            'posts_post', 'post_group_pub_date_idx')
+
+    def test_profile_uses_author_pub_date_index(self):
+        self.assertPlanUses(
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            'posts_post', 'post_author_pub_date_idx')
+
+    def constraint_index(self, table, name):
+        """Индекс, которым SQLite обеспечивает UNIQUE-ограничение name.
+
+        Ограничение из миграции SQLite хранит в описании таблицы,
+        а индекс для него называет сам (sqlite_autoindex_...).
+        """
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_constraints(
+                cursor, table)[name]['columns']
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            for _, index, _, origin, *_ in cursor.fetchall():
+                cursor.execute(f'PRAGMA index_info("{index}")')
+                indexed = [row[2] for row in cursor.fetchall()]
+                if origin == 'u' and indexed == columns:
+                    return index
+        self.fail(f'Нет индекса ограничения {name}')
+
+    def test_profile_follow_check_uses_unique_index(self):
+        index = self.constraint_index('posts_follow', 'unique_follow')
+        self.assertPlanUses(
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            'posts_follow', f'USING COVERING INDEX {index} (')
+
+    def test_post_detail_uses_comment_index(self):
+        self.assertPlanUses(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            'posts_comment', 'comment_post_created_idx')
+
+    def test_follow_index_uses_feed_index(self):
+        self.assertPlanUses(
+            reverse('posts:follow_index'),
+            'posts_post', 'feed_user_pub_date_idx')
+
+    def test_follow_cursor_page_uses_feed_index(self):
+        url = reverse('posts:follow_index')
+        first_page = self.reader_client.get(
+            url, {'cursor': ''}).context['page_obj']
+        self.assertPlanUses(
+            f'{url}?cursor={first_page.next_cursor()}',
+            'posts_post', 'feed_user_pub_date_idx')
+
+    def test_cursor_page_uses_pub_date_index(self):
+        self.assertPlanUses(
+            reverse('posts:index') + '?cursor=',
+            'posts_post', 'post_pub_date_idx')
@@ -0,0 +1,115 @@
+from unittest import SkipTest
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, PostTerm, User
+from ..search import filter_posts, has_fts5, search_posts
+
+
+class SearchTestMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.rare = Post.objects.create(
+            author=cls.user, text='Кот гуляет по крыше')
+        cls.often = Post.objects.create(
+            author=cls.user, text='Кот, кот и ещё раз кот <b>крыша</b>')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Собака спит')
+
+    def test_ranks_more_relevant_first(self):
+        """Пост, где слово встречается чаще, идёт первым."""
+        page = search_posts('кот')
+        self.assertEqual(list(page), [self.often, self.rare])
+
+    def test_all_words_required(self):
+        """Находятся только посты со всеми словами запроса."""
+        self.assertEqual(list(search_posts('кот гуляет')), [self.rare])
+        self.assertEqual(list(search_posts('кот спит')), [])
+
+    def test_snippet_highlights_and_escapes(self):
+        """Найденные слова подсвечены, разметка из текста экранирована."""
+        post = list(search_posts('крыша'))[0]
+        self.assertIn('<mark>крыша</mark>', post.snippet)
+        self.assertIn('&lt;b&gt;', post.snippet)
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.create(author=self.user, text='Ёжик в тумане')
+        self.assertEqual(list(search_posts('ёжик')), [post])
+        post.text = 'Лошадь в тумане'
+        post.save()
+        self.assertEqual(list(search_posts('ёжик')), [])
+        self.assertEqual(list(search_posts('лошадь')), [post])
+        post.delete()
+        self.assertEqual(list(search_posts('туман')), [])
+        self.assertEqual(list(search_posts('тумане')), [])
+
+    @override_settings(LIMIT=1)
+    def test_cursor_pages(self):
+        """Курсор листает результаты без повторов."""
+        first = search_posts('кот')
+        second = search_posts('кот', first.next_cursor())
+        self.assertEqual(list(first) + list(second), [self.often, self.rare])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+
+    def test_filter_posts(self):
+        """filter_posts сужает queryset до найденных постов."""
+        found = filter_posts(Post.objects.all(), 'собака')
+        self.assertEqual(list(found), [self.other])
+        self.assertFalse(filter_posts(Post.objects.all(), '!!!').exists())
+
+    def test_search_view(self):
+        """Страница поиска показывает отрывки найденных постов."""
+        response = Client().get(reverse('posts:search'), {'q': 'собака'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']), [self.other])
+        self.assertContains(response, '<mark>Собака</mark>')
+
+
+class SearchFTSTest(SearchTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Проверяется тестовая база, а не рабочая, и не при импорте.
+        if not has_fts5(connection):
+            raise SkipTest('SQLite собран без FTS5')
+        super().setUpClass()
+
+    def test_terms_table_is_not_filled(self):
+        """С FTS5 таблица слов не ведётся."""
+        self.assertFalse(PostTerm.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='terms')
+class SearchTermsTest(SearchTestMixin, TestCase):
+    def test_terms_table_is_filled(self):
+        """Без FTS5 слова поста попадают в PostTerm."""
+        self.assertEqual(
+            PostTerm.objects.get(post=self.often, term='кот').count, 3)
+
+
+class SearchAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.post = Post.objects.create(author=cls.admin, text='Кот на крыше')
+        Post.objects.create(author=cls.admin, text='Собака спит')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс, без LIKE."""
+        client = Client()
+        client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'крыше'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
+        self.assertFalse(
+            any(' LIKE ' in query['sql'] for query in queries))
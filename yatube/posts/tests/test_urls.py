@@ -1,9 +1,10 @@
 from http import HTTPStatus
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 
 from ..models import Post, Group, User
 
 
+@override_settings(PAGE_CACHE_TIMEOUT=0)
 class PostsURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
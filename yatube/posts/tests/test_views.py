@@ -1,19 +1,25 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from ..models import Post, Group, Comment, User
+from ..feed_cache import FEED, GENERATION_KEY, GROUPS
+from ..models import (
+    AuthorStats, Post, Group, Comment, User, FeedEntry, Follow)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, PAGE_CACHE_TIMEOUT=0,
+                   THUMBNAIL_WORKERS=0)
 class ViewsPostTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -212,6 +218,17 @@ class ViewsPostTest(TestCase):
             self.response_profile_second.context['page_obj'].end_index(),
             ViewsPostTest.NUMBER_OF_POSTS)
 
+    def test_profile_pages_use_stats_count(self):
+        """Номерные страницы профиля берут число постов из счётчика."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.guest_client.get(
+                reverse('posts:profile', kwargs=self.kwargs_username)
+                + '?page=2')
+        self.assertEqual(
+            response.context['page_obj'].end_index(), self.NUMBER_OF_POSTS)
+        self.assertFalse(any('COUNT(*)' in query['sql']
+                             for query in captured.captured_queries))
+
     def test_first_page_group_contains_ten_records(self):
         self.assertEqual(
             self.response_group_first.context['page_obj'].end_index(),
@@ -301,13 +318,15 @@ class ViewsCacheTest(TestCase):
         )
         cls.index_url = reverse('posts:index')
 
+    def setUp(self):
+        cache.clear()
+
     def test_cache_index(self):
         """Список записей index кешируется"""
         first_response = ViewsCacheTest.authorized_client.get(
             self.index_url)
-        Post.objects.create(
-            text='Тестовый пост 2',
-            author=ViewsCacheTest.user, )
+        Post.objects.filter(pk=ViewsCacheTest.post.pk).update(
+            text='Изменено в обход сигналов')
         second_response = ViewsCacheTest.authorized_client.get(
             self.index_url)
         cache.clear()
@@ -316,7 +335,29 @@ class ViewsCacheTest(TestCase):
         self.assertEqual(first_response.content, second_response.content)
         self.assertNotEqual(second_response.content, third_response.content)
 
+    def test_new_post_invalidates_index_cache(self):
+        """Новый пост сразу сбрасывает кеш index."""
+        self.authorized_client.get(self.index_url)
+        Post.objects.create(
+            text='Тестовый пост 2',
+            author=ViewsCacheTest.user, )
+        response = self.authorized_client.get(self.index_url)
+        self.assertContains(response, 'Тестовый пост 2')
 
+    @override_settings(LIMIT=1)
+    def test_index_cache_depends_on_page(self):
+        """Страницы index кешируются отдельно."""
+        Post.objects.create(
+            text='Тестовый пост 2',
+            author=ViewsCacheTest.user, )
+        first_page = self.authorized_client.get(self.index_url)
+        second_page = self.authorized_client.get(
+            self.index_url + '?page=2')
+        self.assertContains(first_page, 'Тестовый пост 2')
+        self.assertNotContains(second_page, 'Тестовый пост 2')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
 class ViewsFollowTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -384,3 +425,367 @@ class ViewsFollowTest(TestCase):
         self.assertRedirects(response_second_follow,
                              reverse('posts:profile',
                                      kwargs={'username': 'author'}))
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ViewsCursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.guest_client = Client()
+        cls.NUMBER_OF_POSTS = 13
+        cls.PAGE_LIMIT = 10
+        for i in range(cls.NUMBER_OF_POSTS):
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+        cls.index_url = reverse('posts:index')
+
+    def get_page(self, cursor=''):
+        response = self.guest_client.get(self.index_url, {'cursor': cursor})
+        return response.context['page_obj']
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсор проходит ленту без пропусков и повторов."""
+        first_page = self.get_page()
+        second_page = self.get_page(first_page.next_cursor())
+        self.assertEqual(len(first_page), self.PAGE_LIMIT)
+        self.assertEqual(
+            len(second_page), self.NUMBER_OF_POSTS - self.PAGE_LIMIT)
+        self.assertFalse(second_page.has_next())
+        ids = [post.pk for post in list(first_page) + list(second_page)]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('pk', flat=True)))
+
+    def test_cursor_previous_page(self):
+        """Курсор «новее» возвращает на предыдущую страницу."""
+        first_page = self.get_page()
+        second_page = self.get_page(first_page.next_cursor())
+        back_page = self.get_page(second_page.previous_cursor())
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Курсорная страница не выполняет COUNT(*)."""
+        cursor = self.get_page().next_cursor()
+        with self.assertNumQueries(1):
+            page = self.get_page(cursor)
+            list(page)
+
+    def test_cursor_page_has_no_number(self):
+        """Курсорная страница не выдаёт себя за первую."""
+        self.assertIsNone(self.get_page().number)
+
+    def test_page_links_keep_other_params(self):
+        """Ссылки на соседние страницы сохраняют остальные параметры."""
+        response = self.guest_client.get(
+            self.index_url, {'cursor': '', 'q': 'кот'})
+        cursor = response.context['page_obj'].next_cursor()
+        self.assertContains(
+            response, f'href="?q=%D0%BA%D0%BE%D1%82&amp;cursor={cursor}"')
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        page = self.get_page('не-курсор')
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), self.PAGE_LIMIT)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0, COMMENTS_LIMIT=5)
+class ViewsCommentPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.guest_client = Client()
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.NUMBER_OF_COMMENTS = 8
+        for i in range(cls.NUMBER_OF_COMMENTS):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}')
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+        cls.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk})
+
+    def test_post_detail_shows_first_comments(self):
+        """post_detail показывает первую порцию комментариев."""
+        comments = self.guest_client.get(self.detail_url).context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(5)])
+        self.assertTrue(comments.has_next())
+
+    def test_fragment_returns_next_comments(self):
+        """Фрагмент по курсору отдаёт оставшиеся комментарии."""
+        first = self.guest_client.get(self.detail_url).context['comments']
+        response = self.guest_client.get(
+            self.comments_url, {'cursor': first.next_cursor()})
+        second = response.context['comments']
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.text for comment in second],
+            [f'Комментарий {i}' for i in range(5, self.NUMBER_OF_COMMENTS)])
+        self.assertFalse(second.has_next())
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_fragment_of_missing_post_is_404(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.guest_client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk + 100}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_query_does_not_join_posts(self):
+        """Комментарии выбираются одним запросом без JOIN к постам."""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.comments_url)
+        sql = [query['sql'] for query in queries
+               if 'posts_comment' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('"posts_post"', sql[0])
+
+
+class ViewsFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки')
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.old_post])
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        follow.delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.follower).exists())
+
+
+@override_settings(FEED_PUSH_FOLLOWER_LIMIT=2,
+                   FEED_PUSH_RESUME_FOLLOWER_LIMIT=1,
+                   FEED_WORKERS=0, LIMIT=2)
+class ViewsHybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.posts = []
+        for i in range(3):
+            self.posts.append(
+                Post.objects.create(author=self.author, text=f'Пост {i}'))
+            self.posts.append(
+                Post.objects.create(author=self.star, text=f'Звезда {i}'))
+        self.posts.reverse()
+
+    def get_feed(self, params=None):
+        response = self.follower_client.get(
+            reverse('posts:follow_index'), params or {})
+        return response.context['page_obj']
+
+    def test_popular_author_posts_are_not_pushed(self):
+        """Посты популярного автора не рассылаются по лентам."""
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.star).exists())
+        self.assertTrue(FeedEntry.objects.filter(
+            post__author=self.author).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Слитая лента листается курсором до самого старого поста."""
+        pages = [self.get_feed()]
+        while pages[-1].has_next():
+            pages.append(
+                self.get_feed({'cursor': pages[-1].next_cursor()}))
+        self.assertTrue(pages[0].paginator.cursor_mode)
+        self.assertEqual(
+            [post for page in pages for post in page], self.posts)
+
+    def test_cursor_over_merged_feed(self):
+        """Курсорная пагинация работает поверх слитой ленты."""
+        first_page = self.get_feed({'cursor': ''})
+        second_page = self.get_feed({'cursor': first_page.next_cursor()})
+        self.assertEqual(
+            list(first_page) + list(second_page), self.posts[:4])
+
+    def test_author_leaving_popular_is_pushed_again(self):
+        """Автор возвращается к рассылке только ниже второго порога."""
+        star_entries = FeedEntry.objects.filter(
+            user=self.follower, post__author=self.star)
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertFalse(star_entries.exists())
+        self.assertTrue(AuthorStats.objects.get(user=self.star).pull_feed)
+        Follow.objects.filter(user=self.reader, author=self.star).delete()
+        self.assertEqual(star_entries.count(), 3)
+        self.assertFalse(AuthorStats.objects.get(user=self.star).pull_feed)
+        self.assertEqual(self.get_feed({'page': 1}).paginator.count, 6)
+
+
+class ViewsPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.guest_client = Client()
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'author'})
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_profile_is_personalized(self):
+        """Копия профиля из кеша дополняется данными посетителя."""
+        self.guest_client.get(self.profile_url)
+        response = self.follower_client.get(self.profile_url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Пользователь: follower')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Войти')
+
+    def test_cached_post_detail_is_personalized(self):
+        """Автор видит свою кнопку и форму на странице поста из кеша."""
+        self.guest_client.get(self.post_url)
+        response = self.author_client.get(self.post_url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(response, 'редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        guest_response = self.guest_client.get(self.post_url)
+        self.assertNotContains(guest_response, 'Добавить комментарий')
+
+    def test_comment_invalidates_cached_post_detail(self):
+        """Новый комментарий сбрасывает копию страницы поста."""
+        self.guest_client.get(self.post_url)
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Новый комментарий')
+        response = self.guest_client.get(self.post_url)
+        self.assertContains(response, 'Новый комментарий')
+
+
+class ViewsConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+        cls.index_url = reverse('posts:index')
+        cls.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'author'})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_index_returns_304(self):
+        """Неизменная лента отдаётся ответом 304 без запросов к базе."""
+        etag = self.guest_client.get(self.index_url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                self.index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_changes_etag(self):
+        """Новый пост меняет валидатор ленты."""
+        etag = self.guest_client.get(self.index_url)['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(
+            self.index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_evicted_generation_does_not_restore_etag(self):
+        """Вытесненное из кеша поколение не возвращает старый валидатор."""
+        etag = self.guest_client.get(self.index_url)['ETag']
+        cache.delete_many(
+            [GENERATION_KEY.format(scope) for scope in (FEED, GROUPS)])
+        response = self.guest_client.get(
+            self.index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_name_change_resets_etags(self):
+        """Смена имени автора меняет валидаторы ленты и профиля."""
+        etags = {url: self.guest_client.get(url)['ETag']
+                 for url in (self.index_url, self.profile_url)}
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Лев'
+        author.save(update_fields=['first_name'])
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Лев')
+
+    def test_username_change_resets_comment_etags(self):
+        """Смена логина меняет валидатор комментариев с ним."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        etag = self.guest_client.get(url)['ETag']
+        reader = User.objects.get(pk=self.reader.pk)
+        reader.username = 'new_reader'
+        reader.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'new_reader')
+
+    def test_login_keeps_etags(self):
+        """Вход пользователя не меняет валидаторы."""
+        etag = self.guest_client.get(self.index_url)['ETag']
+        self.reader_client.force_login(self.reader)
+        response = self.guest_client.get(
+            self.index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_page_and_visitor(self):
+        """Валидатор зависит от страницы и посетителя."""
+        guest_etag = self.guest_client.get(self.index_url)['ETag']
+        reader_etag = self.reader_client.get(self.index_url)['ETag']
+        page_etag = self.guest_client.get(
+            self.index_url + '?page=2')['ETag']
+        self.assertNotEqual(guest_etag, reader_etag)
+        self.assertNotEqual(guest_etag, page_etag)
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет валидатор профиля для подписчика."""
+        etag = self.reader_client.get(self.profile_url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(
+            self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Отписаться')
@@ -15,25 +15,33 @@ Including another URLconf
 """
 
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index,
          name='index'),
+    path('search/', views.search,
+         name='search'),
+    path('autocomplete/', views.names_autocomplete,
+         name='autocomplete'),
     path('group/<slug:slug>/', views.group_posts,
          name='group_list'),
     path('profile/<str:username>/', views.profile,
          name='profile'),
     path('posts/<int:post_id>/', views.post_detail,
          name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('create/', views.post_create,
          name='post_create'),
+    path('export/', views.export_data,
+         name='export'),
     path('follow/', views.follow_index,
          name='follow_index'),
     path('profile/<str:username>/follow/',
@@ -42,4 +50,14 @@ urlpatterns = [
     path('profile/<str:username>/unfollow/',
          views.profile_unfollow,
          name='profile_unfollow'),
+    path('api/v1/posts/', api.index,
+         name='api_index'),
+    path('api/v1/posts/import/', api.import_posts,
+         name='api_import_posts'),
+    path('api/v1/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/v1/profiles/<str:username>/posts/', api.profile,
+         name='api_profile'),
+    path('api/v1/follow/posts/', api.follow_index,
+         name='api_follow_index'),
 ]
@@ -1,11 +1,42 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.views.decorators.http import condition
 
+from core.page_cache import cache_page_with_holes, get_version, page_etag
+from . import autocomplete, feed_cache
+from .export import FORMATS, export
+from .feed import CURSOR_LOOKUPS, feed_posts
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .paginator import post_paginator
+from .models import Comment, Post, Group, User, Follow
+from .paginator import CURSOR_PARAM, comment_paginator, post_paginator
+from .search import search_posts
+from .stats import get_stats
 
 
+def is_following(request, username):
+    """Подписан ли посетитель на автора."""
+    if not request.user.is_authenticated:
+        return False
+    return Follow.objects.filter(
+        user=request.user, author__username=username).exists()
+
+
+def profile_holes(request, username):
+    """Персональные данные для кешированной страницы автора."""
+    return {'following': is_following(request, username)}
+
+
+def post_detail_holes(request, post_id):
+    """Персональные данные для кешированной страницы поста."""
+    return {'form': CommentForm()}
+
+
+@condition(etag_func=page_etag(
+    feed_cache.index_version, feed_cache.personal_version))
+@cache_page_with_holes(feed_cache.index_version)
 def index(request):
     """Главная страница."""
     template = 'posts/index.html'
@@ -13,10 +44,15 @@ def index(request):
     page_obj = post_paginator(request, post_list)
     context = {
         'page_obj': page_obj,
+        'feed_generation': get_version(request, feed_cache.index_version),
+        'cache_timeout': settings.INDEX_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@condition(etag_func=page_etag(
+    feed_cache.group_version, feed_cache.personal_version))
+@cache_page_with_holes(feed_cache.group_version)
 def group_posts(request, slug):
     """Страница группы."""
     template = 'posts/group_list.html'
@@ -29,39 +65,74 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@condition(etag_func=page_etag(
+    feed_cache.profile_version, feed_cache.personal_version))
+@cache_page_with_holes(feed_cache.profile_version, profile_holes)
 def profile(request, username):
     """Страница с постами пользователя."""
-    follower = request.user
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
+    author_stats = get_stats(author.pk)
     post_list = author.posts.select_related('group', 'author')
-    page_obj = post_paginator(request, post_list)
-    following = False
-    if follower.is_authenticated:
-        following = Follow.objects.filter(
-            user=follower, author=author).exists()
+    page_obj = post_paginator(
+        request, post_list, count=author_stats.posts_count)
+    following = is_following(request, author.username)
     context = {'page_obj': page_obj,
                'author': author,
+               'author_stats': author_stats,
                'following': following}
     return render(request, template, context)
 
 
+@condition(etag_func=page_etag(
+    feed_cache.post_detail_version, feed_cache.personal_version))
+@cache_page_with_holes(feed_cache.post_detail_version, post_detail_holes)
 def post_detail(request, post_id):
     """Страница с подробной информацией о посте."""
     template = 'posts/post_detail.html'
     post = get_object_or_404(Post, pk=post_id)
-    count = Post.objects.select_related(
-        'group',
-        'author').filter(author=post.author).count()
+    count = get_stats(post.author_id).posts_count
     form = CommentForm(request.POST or None)
-    comments_list = post.comments.select_related('post', 'author')
+    comments = comment_paginator(
+        request, post.comments.select_related('author'))
     context = {'post': post,
                'count': count,
                'form': form,
-               'comments': comments_list}
+               'comments': comments}
+    return render(request, template, context)
+
+
+@condition(etag_func=page_etag(feed_cache.comments_version))
+@cache_page_with_holes(feed_cache.comments_version)
+def post_comments(request, post_id):
+    """Очередная порция комментариев к посту, фрагментом HTML."""
+    template = 'posts/includes/comments.html'
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comment_paginator(
+        request,
+        Comment.objects.filter(post_id=post_id).select_related('author'))
+    context = {'comments': comments,
+               'post_id': post_id}
     return render(request, template, context)
 
 
+def search(request):
+    """Поиск постов по словам, лучшие совпадения первыми."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = search_posts(query, request.GET.get(CURSOR_PARAM))
+    context = {'query': query,
+               'page_obj': page_obj}
+    return render(request, template, context)
+
+
+def names_autocomplete(request):
+    """Пользователи и группы по началу имени, в JSON."""
+    prefix = request.GET.get('q', '').strip()
+    results = autocomplete.lookup(prefix) if prefix else []
+    return JsonResponse({'results': results})
+
+
 @login_required
 def post_create(request):
     """Страница создания поста."""
@@ -73,7 +144,8 @@ def post_create(request):
             username = request.user
             post = form.save(commit=False)
             post.author = username
-            post.save()
+            with transaction.atomic():
+                post.save()
             return redirect('posts:profile', username)
     form = PostForm()
     context = {'form': form}
@@ -116,15 +188,29 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@login_required
+def export_data(request):
+    """Выгрузка постов и комментариев посетителя потоком."""
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        export(request.user, file_format), content_type=FORMATS[file_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.{file_format}"')
+    return response
+
+
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = post_paginator(request, posts_list)
+    posts_list = feed_posts(request.user).select_related('group', 'author')
+    page_obj = post_paginator(request, posts_list, lookups=CURSOR_LOOKUPS)
     context = {'page_obj': page_obj}
     return render(request, template, context)
 
@@ -136,7 +222,8 @@ def profile_follow(request, username):
     follow_exist = Follow.objects.filter(
         user=follower, author=author).exists()
     if not follow_exist and follower != author:
-        Follow.objects.create(user=follower, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=follower, author=author)
     return redirect('posts:profile', username=author)
 
 
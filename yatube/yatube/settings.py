@@ -102,6 +102,35 @@ USE_TZ = True
 
 LIMIT = 10
 
+COMMENTS_LIMIT = 20
+
+# Наибольший размер страницы JSON API (?limit=).
+API_MAX_LIMIT = 100
+
+AUTOCOMPLETE_LIMIT = 10
+# Как часто (в секундах) индекс автодополнения сверяется с изменениями
+# имён, сделанными в других процессах.
+AUTOCOMPLETE_REFRESH_INTERVAL = 1
+
+# 'offset' — нумерованные страницы, 'cursor' — пагинация по (pub_date, id).
+POST_PAGINATION = 'offset'
+
+# Посты авторов, у которых подписчиков больше этого числа, не рассылаются
+# по лентам, а подмешиваются в ленту подписок при чтении.
+FEED_PUSH_FOLLOWER_LIMIT = 1000
+# Обратно на рассылку автор переходит, когда подписчиков остаётся
+# не больше этого числа: запас между порогами не даёт переключать
+# его туда и обратно на каждой подписке и отписке.
+FEED_PUSH_RESUME_FOLLOWER_LIMIT = 900
+# Потоки, которые заполняют ленты при возврате автора к рассылке;
+# 0 — заполнять сразу, в транзакции отписки.
+FEED_WORKERS = 1
+
+# 'auto' — поиск через SQLite FTS5, если он собран, иначе по таблице
+# слов PostTerm; 'terms' — всегда по таблице слов. После смены
+# выполните manage.py rebuild_search_index.
+SEARCH_BACKEND = 'auto'
+
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
@@ -120,8 +149,56 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки картинок (core.images): файлы больше IMAGE_MAX_UPLOAD_SIZE
+# байт и картинки больше IMAGE_MAX_PIXELS пикселей отклоняются
+# по заголовку, до декодирования; стороны длиннее IMAGE_MAX_SIDE
+# уменьшаются при загрузке.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+IMAGE_MAX_PIXELS = 25_000_000
+
+# JPEG при уменьшении декодируется сразу в меньшем масштабе, остальные
+# форматы — целиком (до 4 байт на пиксель), поэтому для них предел ниже.
+IMAGE_MAX_FULL_DECODE_PIXELS = 12_000_000
+
+IMAGE_MAX_SIDE = 2560
+
+IMAGE_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP']
+
+# Миниатюры создаёт пул потоков, а не первый запрос страницы.
+THUMBNAIL_BACKEND = 'core.thumbnails.ReadyThumbnailBackend'
+
+THUMBNAIL_WORKERS = 2
+
+# Картинка поста отдаётся лестницей ширин (srcset) с кадром
+# POST_IMAGE_SIZE: в современных форматах, которые умеет Pillow,
+# и в JPEG для остальных браузеров (core.thumbnails).
+POST_IMAGE_SIZE = (960, 339)
+
+POST_IMAGE_WIDTHS = [320, 640, 960]
+
+# Размер размытой копии, которая видна, пока картинка грузится.
+POST_IMAGE_PLACEHOLDER_SIZE = (16, 6)
+
+POST_IMAGE_MODERN_FORMATS = ['AVIF', 'WEBP']
+
+# Фрагмент ленты сбрасывается сменой поколения, поэтому может жить долго.
+INDEX_CACHE_TIMEOUT = 60 * 60
+
+# Общие для всех посетителей копии страниц лент и постов; 0 отключает.
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Общий для всех воркеров узла кеш в файле SQLite (core.sqlite_cache).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Тесты получают свой кеш во временном каталоге.
+TEST_RUNNER = 'core.testing.TestRunner'